@@ -0,0 +1,6 @@
+#!/bin/bash
+
+# instances and configurations are listed in experiments/portfolio.json
+# the tabu search stops at the bound of the ilp solver, no targets are needed
+# extra options are forwarded to the runner (e.g. --threads 4)
+python -m src.run_experiments --matrix experiments/portfolio.json "$@"
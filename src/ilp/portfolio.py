@@ -0,0 +1,44 @@
+from ..model.op import OP
+from ..model.execution_context import ExecutionContext
+from ..model.result_exporter import ResultExporter
+from ..tabu.tabu_search import TabuSearch
+from .solver import ILPSolver
+
+import threading
+import time
+
+def solve_portfolio(op: OP, context: ExecutionContext, exporter: ResultExporter, max_time_sec: int, threads: int=0, formulation: str="mtz", fractional_cuts: bool=False, **ts_kwargs):
+    """
+    Run the tabu search (in a thread) and the ilp solver concurrently with the same context:
+    - the improvements of both solvers are recorded in the same trace
+    - the best solutions of the tabu search are injected in gurobi as incumbents (cbSetSolution)
+    - gurobi publishes its bound in context.UB, and the tabu search stops when its best score reaches it
+    - the tabu search stops when the ilp solver finishes (optimal or time limit)
+
+    Only the tabu search exports figures (pyplot is not thread safe).
+    """
+    context.stop_event = threading.Event()
+
+    ts = TabuSearch(op, context, exporter, max_time_sec=max_time_sec, target=99999999, **ts_kwargs)
+    ilp_exporter = ResultExporter(op, context.out_relative_path, figure_export_option=0)
+    solver = ILPSolver(op, context, ilp_exporter, max_time_sec, threads=threads, formulation=formulation, fractional_cuts=fractional_cuts, share_incumbent=True)
+
+    # the exception of the tabu search is raised again in the main thread
+    errors = []
+    def run_tabu_search(start: float):
+        try:
+            ts.solve(start)
+        except BaseException as e:
+            errors.append(e)
+
+    start = time.time()
+    tabu = threading.Thread(target=run_tabu_search, args=(start,), name="tabu_search")
+    tabu.start()
+    try:
+        solver.solve(start)
+    finally:
+        context.request_stop()
+        tabu.join()
+
+    if errors:
+        raise errors[0]
@@ -0,0 +1,93 @@
+from collections import deque
+
+def subtours(n: int, arcs: list[tuple[int, int]]) -> list[list[int]]:
+    """
+    Cycles of an integer solution that are not connected to the path 0 -> n-1
+    """
+    next = {i: j for i, j in arcs}
+
+    in_path = {0}
+    cur = 0
+    while cur in next and cur != n - 1:
+        cur = next[cur]
+        in_path.add(cur)
+
+    cycles = []
+    seen = set(in_path)
+    for start in next:
+        if start in seen:
+            continue
+        cycle = []
+        cur = start
+        while cur not in seen:
+            seen.add(cur)
+            cycle.append(cur)
+            cur = next.get(cur, start)
+        cycles.append(cycle)
+
+    return cycles
+
+def violated_cuts(n: int, x_vals: dict[tuple[int, int], float], eps: float=1e-4) -> list[tuple[list[int], int]]:
+    """
+    Separate the cuts x(in(S)) >= y_k (0 not in S, k in S, y_k = in-degree of k) violated
+    by a fractional solution, with a max-flow from 0 to each visited vertex k.
+
+    Returns the (S, k) pairs of the violated cuts.
+    """
+    capacity: dict[int, dict[int, float]] = {v: {} for v in range(n)}
+    in_degree = [0.0] * n
+    for (i, j), val in x_vals.items():
+        if val > eps and i != j:
+            capacity[i][j] = capacity[i].get(j, 0.0) + val
+            capacity[j].setdefault(i, 0.0)
+            in_degree[j] += val
+
+    cuts = []
+    covered = set()
+    for k in sorted(range(1, n), key=lambda v: -in_degree[v]):
+        if in_degree[k] <= eps or k in covered:
+            continue
+
+        flow, S = _min_cut(capacity, 0, k)
+        if flow < in_degree[k] - eps:
+            cuts.append((S, k))
+            covered.update(S)
+
+    return cuts
+
+def _min_cut(capacity: dict[int, dict[int, float]], source: int, sink: int) -> tuple[float, list[int]]:
+    """
+    Edmonds-Karp max-flow, returns the flow and the sink side of the minimum cut
+    """
+    residual = {u: dict(arcs) for u, arcs in capacity.items()}
+    flow = 0.0
+
+    while True:
+        parent = {source: None}
+        queue = deque([source])
+        while queue and sink not in parent:
+            u = queue.popleft()
+            for v, cap in residual[u].items():
+                if cap > 1e-9 and v not in parent:
+                    parent[v] = u
+                    queue.append(v)
+
+        if sink not in parent:
+            return flow, [v for v in residual if v not in parent]
+
+        # bottleneck of the augmenting path
+        bottleneck = float("inf")
+        v = sink
+        while parent[v] is not None:
+            u = parent[v]
+            bottleneck = min(bottleneck, residual[u][v])
+            v = u
+
+        v = sink
+        while parent[v] is not None:
+            u = parent[v]
+            residual[u][v] -= bottleneck
+            residual[v][u] = residual[v].get(u, 0.0) + bottleneck
+            v = u
+
+        flow += bottleneck
@@ -5,80 +5,292 @@ from ..model.op import OP
 from ..model.execution_context import ExecutionContext
 from ..model.result_exporter import ResultExporter
 from ..model.solution import Solution
+from .separation import subtours, violated_cuts
+
+import numpy as np
+import scipy.sparse as sp
+import queue
+import threading
+import time
+
+FORMULATIONS = ["mtz", "sec"]
 
 class ILPSolver:
-    def __init__(self, op: OP, context: ExecutionContext, exporter: ResultExporter, max_time_sec: int):
+    """
+    formulation:
+        mtz: Miller-Tucker-Zemlin constraints
+        sec: subtour elimination constraints added lazily in the MIPSOL callback
+            (and as user cuts at the root node when fractional_cuts is set)
+
+    initial_sol: MIP start of the solver (see warm_start.py), its score is also the cutoff
+
+    share_incumbent: the best solution of the context, when found by another solver running
+        concurrently (see portfolio.py), is injected in gurobi as the new incumbent
+
+    verbose: gurobi output (disabled for the subproblems of the lns)
+    """
+    def __init__(self, op: OP, context: ExecutionContext, exporter: ResultExporter, max_time_sec: int, threads: int=0, formulation: str="mtz", fractional_cuts: bool=False, initial_sol: Solution | None=None, share_incumbent: bool=False, verbose: bool=True):
         self.op = op
         self.context = context
         self.exporter = exporter
         self.max_time_sec = max_time_sec
+        self.threads = threads #0: gurobi uses all the cores
+        self.formulation = formulation
+        self.fractional_cuts = fractional_cuts
+        self.initial_sol = initial_sol
+        self.share_incumbent = share_incumbent
+        self.verbose = verbose
+        self.last_injected: tuple[int, float] | None = None
 
         self.export_fig_count = 0
 
-    def solve(self) -> ExecutionContext:
+    def solve(self, start: float | None=None) -> ExecutionContext:
+        """
+        start: reference of the improvement times (default = the gurobi runtime)
+        """
         model = gp.Model("op")
+        if not self.verbose:
+            model.setParam("OutputFlag", 0)
         model.setParam("TimeLimit", self.max_time_sec)
-        
-        x = model.addVars(
-            [(i, j) for i in range(self.op.n) for j in range(self.op.n)],
-            vtype=GRB.BINARY,
-            name="x"
-        )
+        model.setParam("Threads", self.threads)
 
-        u = model.addVars(range(self.op.n), vtype=GRB.INTEGER, name="u")
+        build_start = time.time()
+        x = self._build_model(model)
+        build_time = time.time() - build_start
 
-        model.setObjective(
-            gp.quicksum(self.op.V[i].score * x[i, j] for i in range(1, self.op.n-1) for j in range(1, self.op.n)),
-            GRB.MAXIMIZE
-        )
-
-        model.addConstr(
-            gp.quicksum(x[i, i] for i in range(self.op.n)) == 0
-        )
+        # gurobi adds the pending variables and constraints lazily, the update is timed apart
+        update_start = time.time()
+        model.update()
+        update_time = time.time() - update_start
 
-        model.addConstr(
-            gp.quicksum(x[0, i] for i in range(1, self.op.n)) == 1
+        n = self.op.n
+        full_vars, full_constrs = self._full_model_size()
+        self.context.log(
+            f"[preprocessing] {n - 2 - len(self.vertices)}/{n - 2} vertices and {n * n - len(self.arcs)}/{n * n} arcs removed: "
+            f"{full_vars - model.NumVars} variables and {full_constrs - model.NumConstrs} constraints removed", save=True
         )
+        self.context.log(f"[model] build time: {build_time:.3f}s, update time: {update_time:.3f}s", save=True)
+        self.context.build_time = build_time
+        self.context.update_time = update_time
 
-        model.addConstr(
-            gp.quicksum(x[i, self.op.n-1] for i in range(self.op.n-1)) == 1
-        )
+        if self.initial_sol is not None:
+            self._set_mip_start(model, x, self.initial_sol)
 
-        for k in range(1, self.op.n-1):
-            arcs_in = gp.quicksum(x[i, k] for i in range(self.op.n-1))
-            arcs_out = gp.quicksum(x[k, i] for i in range(1, self.op.n))
-            model.addConstr(arcs_in <= 1)
-            model.addConstr(arcs_out <= 1)
-            model.addConstr(arcs_in == arcs_out)
+        model._x = x
 
-        model.addConstr(
-            gp.quicksum(self.op.A[i][j] * x[i, j] for i in range(self.op.n-1) for j in range(1, self.op.n) if i != j) <= self.op.t_max
-        )
+        # the callback only reads the incumbents, they are recorded (trace and figures)
+        # by a background thread so that gurobi is never blocked by our I/O
+        incumbents = queue.Queue()
+        consumer = threading.Thread(target=self._record_incumbents, args=(incumbents,), name="ilp_incumbents", daemon=True)
+        consumer.start()
 
-        for i in range(1, self.op.n-1):
-            model.addConstr(u[i] >= 2)
-            model.addConstr(u[i] <= self.op.n - 1)
+        def save_new_best_sol(model: gp.Model, where):
+            if where == GRB.Callback.MIP:
+                # the bound is published for the solvers running concurrently
+                self.context.UB = model.cbGet(GRB.Callback.MIP_OBJBND)
 
-        for i in range(1, self.op.n-1):
-            for j in range(1, self.op.n-1):
-                model.addConstr(u[i] - u[j] + 1 <= (self.op.n - 2) * (1 - x[i, j]))
+            if self.formulation == "sec" and self.fractional_cuts and where == GRB.Callback.MIPNODE:
+                self._separate_fractional_cuts(model)
 
-        model._x = x
+            if self.share_incumbent and where == GRB.Callback.MIPNODE:
+                self._inject_incumbent(model, incumbents)
 
-        def save_new_best_sol(model: gp.Model, where):
             if where == GRB.Callback.MIPSOL:
-                runtime = model.cbGet(GRB.Callback.RUNTIME)
-                x_vals = model.cbGetSolution(model._x)
+                runtime = model.cbGet(GRB.Callback.RUNTIME) if start is None else time.time() - start
+                selected_arcs = self.arcs[model.cbGetSolution(model._x) > 0.5].tolist()
+
+                if self.formulation == "sec" and self._add_lazy_subtour_cuts(model, selected_arcs):
+                    return #not a feasible solution
+
+                incumbents.put(("incumbent", selected_arcs, float(runtime)))
+
+        try:
+            model.optimize(save_new_best_sol)
+        finally:
+            incumbents.put(None)
+            consumer.join()
 
-                selected_arcs = [(i, j) for (i, j), val in x_vals.items() if val > 0.5]
+        if model.SolCount == 0: #e.g. infeasible with the cutoff of a rejected mip start
+            self.context.log(f"[ilp] no solution found, status={model.Status}", save=True)
+            return
 
-                sol = Solution.from_arcs(self.op.n, selected_arcs)
-                self.context.add_improve(sol, float(runtime))
+        # in the portfolio the context may have a better solution found by the tabu search
+        if self.context.add_gurobi_data(model, self.arcs, x, keep_best=self.share_incumbent) and start is not None:
+            self.context.best_time = time.time() - start
+
+    def _record_incumbents(self, incumbents: queue.Queue):
+        """
+        Records of the callback: ("incumbent", selected arcs, runtime), ("injected", score, dist), None to stop
+        """
+        while True:
+            item = incumbents.get()
+            if item is None:
+                break
+
+            if item[0] == "injected":
+                _, score, dist = item
+                self.context.log(f"[portfolio] incumbent injected: score={score}, dist={dist}", save=True)
+                continue
+
+            _, selected_arcs, runtime = item
+            sol = Solution.from_arcs(self.op, selected_arcs)
+
+            # the mip start is reported again after the presolve, and the injected solutions are already in the context
+            if self.context.add_improve(sol, runtime):
                 self.export_figure(sol, "improve_global")
 
-        model.optimize(save_new_best_sol)
+    def _build_model(self, model: gp.Model) -> gp.MVar:
+        """
+        Build the model over the feasible arcs with the matrix API, the constraints are
+        sparse matrices over the vector x of arcs. Returns x.
+        """
+        n = self.op.n
+        self.arcs = self.op.feasible_arcs()
+        if len(self.arcs) == 0:
+            raise ValueError(f"no feasible path in {self.op.instance}: the distance from the start to the end vertex exceeds t_max")
+        self.vertices = self.op.reachable_vertices()
+        self.vertices = self.vertices[(self.vertices > 0) & (self.vertices < n-1)]
+
+        m = len(self.arcs)
+        tail, head = self.arcs[:, 0], self.arcs[:, 1]
+
+        x = model.addMVar(m, vtype=GRB.BINARY, name="x")
+
+        scores = self.op.scores.astype(np.float64)
+        scores[0] = 0
+        model.setObjective(scores[tail] @ x, GRB.MAXIMIZE)
+
+        # incidence matrices: In[v, e] = 1 if the arc e enters v, Out[v, e] = 1 if it leaves v
+        ones = np.ones(m)
+        In = sp.csr_matrix((ones, (head, np.arange(m))), shape=(n, m))
+        Out = sp.csr_matrix((ones, (tail, np.arange(m))), shape=(n, m))
+
+        model.addConstr(Out[[0]] @ x == 1)
+        model.addConstr(In[[n-1]] @ x == 1)
+
+        In_k, Out_k = In[self.vertices], Out[self.vertices]
+        model.addConstr(In_k @ x <= 1)
+        model.addConstr(Out_k @ x <= 1)
+        model.addConstr((In_k - Out_k) @ x == 0)
+
+        model.addConstr(self.op.A[tail, head].astype(np.float64) @ x <= self.op.t_max)
+
+        if self.formulation == "mtz":
+            self._add_mtz_constraints(model, x)
+        else:
+            # arcs entering each vertex, for the subtour cuts
+            order = np.argsort(head, kind="stable")
+            bounds = np.searchsorted(head[order], np.arange(n + 1))
+            self.arcs_in = [order[bounds[v]:bounds[v+1]] for v in range(n)]
+            self.x_vars = x.tolist()
+
+            model.setParam("LazyConstraints", 1)
+            if self.fractional_cuts:
+                model.setParam("PreCrush", 1)
+
+        return x
+
+    def _add_mtz_constraints(self, model: gp.Model, x: gp.MVar):
+        """
+        u_i - u_j + 1 <= (n - 2) * (1 - x_ij) for the arcs between the vertices of the path, 2 <= u_i <= n - 1
+        """
+        n = self.op.n
+        u = model.addMVar(len(self.vertices), lb=2, ub=n - 1, vtype=GRB.INTEGER, name="u")
+
+        index = np.full(n, -1)
+        index[self.vertices] = np.arange(len(self.vertices))
+
+        arcs = np.flatnonzero((self.arcs[:, 0] != 0) & (self.arcs[:, 1] != n-1))
+        rows = np.arange(len(arcs))
+        U = sp.csr_matrix(
+            (np.r_[np.ones(len(arcs)), -np.ones(len(arcs))], (np.r_[rows, rows], np.r_[index[self.arcs[arcs, 0]], index[self.arcs[arcs, 1]]])),
+            shape=(len(arcs), len(self.vertices))
+        )
+        model.addConstr(U @ u + (n - 2) * x[arcs] <= n - 3)
+
+    def _route_values(self, sol: Solution) -> np.ndarray | None:
+        """
+        Values of x of the path of the solution, None if it uses arcs removed by the preprocessing
+        """
+        n = self.op.n
+        route = sol.get_vertices()
+
+        # the arcs are sorted by (tail, head)
+        keys = self.arcs[:, 0] * n + self.arcs[:, 1]
+        route_keys = np.array([i * n + j for i, j in zip(route, route[1:])], dtype=keys.dtype)
+        idx = np.minimum(np.searchsorted(keys, route_keys), len(keys) - 1)
+        if len(keys) == 0 or np.any(keys[idx] != route_keys):
+            return None
+
+        values = np.zeros(len(self.arcs))
+        values[idx] = 1
+        return values
+
+    def _set_mip_start(self, model: gp.Model, x: gp.MVar, sol: Solution):
+        start = self._route_values(sol)
+        if start is None:
+            self.context.log(f"[warm start] the initial solution uses arcs removed by the preprocessing, ignored", save=True)
+            return
+
+        x.Start = start
+
+        # the scores are integers, the solutions worse than the initial one are pruned
+        model.setParam("Cutoff", sol.score - 0.5)
+        self.context.log(f"[warm start] score={sol.score}, dist={sol.dist:.2f}", save=True)
+
+    def _inject_incumbent(self, model: gp.Model, incumbents: queue.Queue):
+        sol = self.context.best_sol
+        if sol is None or sol.score <= model.cbGet(GRB.Callback.MIPNODE_OBJBST) or self.last_injected == (sol.score, sol.dist):
+            return
+
+        self.last_injected = (sol.score, sol.dist)
+        values = self._route_values(sol)
+        if values is not None:
+            model.cbSetSolution(model._x, values)
+            model.cbUseSolution()
+            incumbents.put(("injected", sol.score, sol.dist)) #logged by _record_incumbents
+
+    def _full_model_size(self) -> tuple[int, int]:
+        """
+        Number of variables and constraints of the model over all the n² arcs (without preprocessing)
+        """
+        n = self.op.n
+        num_vars = n * n
+        num_constrs = 4 + 3 * (n - 2)
+        if self.formulation == "mtz":
+            num_vars += n
+            num_constrs += (n - 2) ** 2
+        return num_vars, num_constrs
+
+    def _subtour_cut(self, model: gp.Model, S: list[int], k: int) -> tuple[gp.LinExpr, gp.LinExpr]:
+        """
+        The path enters S at least once if k is visited: x(in(S)) >= y_k
+        """
+        entering = np.concatenate([self.arcs_in[j] for j in S])
+        entering = entering[~np.isin(self.arcs[entering, 0], S)]
+        arcs_in_S = gp.quicksum(self.x_vars[e] for e in entering.tolist())
+        y_k = gp.quicksum(self.x_vars[e] for e in self.arcs_in[k].tolist())
+        return arcs_in_S, y_k
+
+    def _add_lazy_subtour_cuts(self, model: gp.Model, selected_arcs: list[tuple[int, int]]) -> bool:
+        """
+        Returns True if the integer solution has subtours (and cuts them off)
+        """
+        cycles = subtours(self.op.n, selected_arcs)
+        for cycle in cycles:
+            arcs_in_S, y_k = self._subtour_cut(model, cycle, cycle[0])
+            model.cbLazy(arcs_in_S >= y_k)
+        return len(cycles) > 0
+
+    def _separate_fractional_cuts(self, model: gp.Model):
+        # only at the root node, the max-flow separation is expensive
+        if model.cbGet(GRB.Callback.MIPNODE_STATUS) != GRB.OPTIMAL or model.cbGet(GRB.Callback.MIPNODE_NODCNT) > 0:
+            return
 
-        self.context.add_gurobi_data(model, x)
+        x_vals = dict(zip(map(tuple, self.arcs.tolist()), model.cbGetNodeRel(model._x).tolist()))
+        for S, k in violated_cuts(self.op.n, x_vals):
+            arcs_in_S, y_k = self._subtour_cut(model, S, k)
+            model.cbCut(arcs_in_S >= y_k)
 
     def export_figure(self, sol: Solution, fig_name: str):
         self.exporter.export_solution_figure(sol, f"{self.export_fig_count}_{fig_name}")
@@ -0,0 +1,79 @@
+from ..model.op import OP
+from ..model.solution import Solution
+from ..model.execution_context import ExecutionContext
+from ..model.result_exporter import ResultExporter
+from ..tabu.tabu_search import TabuSearch
+
+from pathlib import Path
+
+import csv
+import glob
+import hashlib
+import time
+
+WARM_STARTS = ["constructive", "tabu"]
+
+def best_route_files(pattern: str) -> list[Path]:
+    """
+    best_route.csv files of the result directories matching the pattern, e.g. results/<instance>/tabu*
+    """
+    files = [Path(directory) / "best_route.csv" for directory in sorted(glob.glob(pattern))]
+    return [file for file in files if file.exists()]
+
+def best_route_files_version(pattern: str) -> str:
+    """
+    Hash of the best_route.csv files matching the pattern, the warm start (and so the result
+    of the run) changes with them (see the result cache keys)
+    """
+    h = hashlib.sha256()
+    for file in best_route_files(pattern):
+        h.update(str(file).encode())
+        h.update(file.read_bytes())
+    return h.hexdigest()
+
+def load_best_route(op: OP, pattern: str) -> Solution | None:
+    """
+    Best route (higher score, then lower distance) among the best_route.csv files of the
+    result directories matching the pattern (see best_route_files)
+    """
+    best = None
+    for file in best_route_files(pattern):
+        with open(file, "r", encoding='utf-8') as f:
+            row = next(csv.DictReader(f))
+        if row["instance"] != op.instance:
+            continue
+
+        sol = Solution.from_route(op, list(map(int, row["route"].split())))
+        if best is None or (sol.score, -sol.dist) > (best.score, -best.dist):
+            best = sol
+
+    return best
+
+def warm_start_solution(op: OP, warm_start: str, out: str, max_time_sec: int=5, rng: int=0) -> Solution | None:
+    """
+    Initial solution of the ilp solver.
+
+    warm_start:
+        constructive: constructive heuristic of the tabu search
+        tabu: tabu search (first improve with intensification) running for max_time_sec
+        otherwise: pattern of the result directories of previous runs (see load_best_route)
+    """
+    if warm_start not in WARM_STARTS:
+        return load_best_route(op, warm_start)
+
+    # the trace of the tabu search is saved in <out>/warm_start
+    out = f"{out}/warm_start"
+    Path(out).mkdir(parents=True, exist_ok=True)
+
+    context = ExecutionContext(op, "warm_start", out, verbose=False)
+    exporter = ResultExporter(op, out, figure_export_option=0, plot_score=False)
+    ts = TabuSearch(op, context, exporter, ls_first_improve=True, enable_diversification=False, enable_intensification=True, max_time_sec=max_time_sec, target=99999999, export_fig_lvl=0, rng=rng)
+
+    if warm_start == "constructive":
+        ts.start = time.time() #reference of the times in the trace
+        return ts.constructive_heuristic()
+
+    ts.solve()
+    context.export_improves_csv()
+    context.export_best_sol_csv()
+    return context.best_sol
@@ -1,20 +1,24 @@
 from .op import OP
 from .solution import Solution
-from ..tabu.evaluator import Evaluator
 
 import gurobipy as gp
-from typing import Any, Tuple
+import numpy as np
 from pathlib import Path
 
 import csv
+import threading
+import time
 
 class ExecutionContext:
-    def __init__(self, op: OP, config_name: str, out_relative_path: str, verbose: bool=True):
+    def __init__(self, op: OP, config_name: str, out_relative_path: str, verbose: bool=True, shared_score=None, stop_event=None):
         self.op = op
         self.config_name = config_name
         self.out_relative_path = out_relative_path
         self.verbose = verbose
-        self.evaluator = Evaluator(op)
+
+        # multiprocessing Value/Event shared by the parallel workers (see tabu/parallel.py)
+        self.shared_score = shared_score
+        self.stop_event = stop_event
 
         self.improves = []
         self.improves_score = []
@@ -23,10 +27,23 @@ class ExecutionContext:
         self.best_score = None
         self.best_dist = None
         self.best_time = None
-        self.UB = None
+        self.UB = None #also updated during the run by the ilp solver (see tabu search stop criteria)
         self.gap = None
         self.is_optimal = None
 
+        # time to build the ilp model and to update it (gurobi), apart from the solver runtime
+        self.build_time = None
+        self.update_time = None
+
+        # wall and cpu time of the whole run, the cpu time of other processes
+        # working for this run (e.g. parallel workers) is added with add_cpu_time
+        self.start_wall_time = time.time()
+        self.start_cpu_time = time.process_time()
+        self.extra_cpu_time = 0.0
+
+        # the tabu search and the ilp solver of the portfolio add their improvements concurrently
+        self.lock = threading.Lock()
+
         self._remove_old_logs()
 
     def log(self, msg: str, save=False):
@@ -37,19 +54,47 @@ class ExecutionContext:
             with open(f"{self.out_relative_path}/logs.txt", "a") as file:
                 file.write(f"{msg}\n")
 
-    def add_improve(self, sol: Solution, time_sec: float):
-        score = self.evaluator.total_score(sol)
-        dist = self.evaluator.total_dist(sol)
+    def add_improve(self, sol: Solution, time_sec: float) -> bool:
+        """
+        Returns False (and ignores the solution) if it does not improve the best solution
+        """
+        score = sol.score
+        dist = sol.dist
+
+        with self.lock:
+            #tolerance for the rounding errors of the distances (e.g. the same path found by the ilp solver)
+            if self.best_sol is not None and (score < self.best_score or (score == self.best_score and dist >= self.best_dist - 1e-9)):
+                return False
+
+            if self.best_sol == None or score > self.best_score:
+                self.improves_score.append([self.op.instance, self.config_name, score, f"{dist:.2f}", f"{time_sec:.2f}"])
 
-        if self.best_sol == None or score > self.best_score:
-            self.improves_score.append([self.op.instance, self.config_name, score, f"{dist:.2f}", f"{time_sec:.2f}"])
+            self.best_sol = Solution.copy(sol)
+            self.best_time = time_sec
+            self.best_score = score
+            self.best_dist = dist
 
-        self.best_sol = Solution.copy(sol)
-        self.best_time = time_sec
-        self.best_score = score
-        self.best_dist = dist
+            self.improves.append([self.op.instance, self.config_name, score, f"{dist:.2f}", f"{time_sec:.2f}"])
 
-        self.improves.append([self.op.instance, self.config_name, score, f"{dist:.2f}", f"{time_sec:.2f}"])
+        if self.shared_score is not None:
+            with self.shared_score.get_lock():
+                if score > self.shared_score.value:
+                    self.shared_score.value = score
+
+        return True
+
+    def shared_best_score(self) -> int | None:
+        """
+        Best score found by any of the parallel workers
+        """
+        return None if self.shared_score is None else self.shared_score.value
+
+    def request_stop(self):
+        if self.stop_event is not None:
+            self.stop_event.set()
+
+    def stop_requested(self) -> bool:
+        return self.stop_event is not None and self.stop_event.is_set()
 
     def export_improves_csv(self):
         with open(f"{self.out_relative_path}/improves.csv", "w", encoding='utf-8') as file:
@@ -65,29 +110,67 @@ class ExecutionContext:
             output = [["instance", "config", "score", "dist", "time"]] + self.improves_score
             writer.writerows(output)
 
+    def add_cpu_time(self, cpu_time: float):
+        self.extra_cpu_time += cpu_time
+
+    def wall_time(self) -> float:
+        return time.time() - self.start_wall_time
+
+    def cpu_time(self) -> float:
+        return time.process_time() - self.start_cpu_time + self.extra_cpu_time
+
     def export_best_sol_csv(self):
         score = "" if self.best_score is None else self.best_score
         dist = "" if self.best_dist is None else f"{self.best_dist:.2f}"
-        time = "" if self.best_time is None else f"{self.best_time:.2f}"
+        best_time = "" if self.best_time is None else f"{self.best_time:.2f}"
         ub = "" if self.UB is None else f"{self.UB:.2f}"
         gap = "" if self.gap is None else f"{self.gap:.2f}"
+        build_time = "" if self.build_time is None else f"{self.build_time:.2f}"
+        update_time = "" if self.update_time is None else f"{self.update_time:.2f}"
 
         with open(f"{self.out_relative_path}/best.csv", "w", encoding='utf-8') as file:
             writer = csv.writer(file)
             writer.writerows([
-                ["instance", "config", "score", "dist", "UB", "gap", "time"],
-                [self.op.instance, self.config_name, score, dist, ub, gap, time]
+                ["instance", "config", "score", "dist", "UB", "gap", "time", "wall_time", "cpu_time", "build_time", "update_time"],
+                [self.op.instance, self.config_name, score, dist, ub, gap, best_time, f"{self.wall_time():.2f}", f"{self.cpu_time():.2f}", build_time, update_time]
+            ])
+
+    def export_best_route_csv(self):
+        """
+        Vertices of the best path in visiting order (e.g. to warm start the ilp solver)
+        """
+        if self.best_sol is None:
+            return
+
+        with open(f"{self.out_relative_path}/best_route.csv", "w", encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerows([
+                ["instance", "config", "score", "dist", "route"],
+                [self.op.instance, self.config_name, self.best_sol.score, f"{self.best_sol.dist:.2f}", " ".join(map(str, self.best_sol.get_vertices()))]
             ])
 
-    def add_gurobi_data(self, model: gp.Model, x: gp.tupledict[Tuple[Any, ...], gp.Var]):
-        self.best_sol = Solution.from_gurobi(self.op.n, x)
+    def add_gurobi_data(self, model: gp.Model, arcs: np.ndarray, x: gp.MVar, keep_best: bool=False) -> bool:
+        """
+        keep_best: the best solution of the context is kept unless the solution of gurobi improves it
+        (portfolio, the tabu search may find a better one after the last injection in gurobi).
+        Returns False if the best solution was kept
+        """
+        sol = Solution.from_gurobi(self.op, arcs, x)
         self.UB = model.ObjBound
         self.gap = model.MIPGap * 100
-        self.best_score = model.ObjVal
-        self.best_dist = self.evaluator.total_dist(self.best_sol)
-        self.best_time = model.Runtime
         self.is_optimal = model.Status == gp.GRB.OPTIMAL
 
+        with self.lock:
+            if keep_best and self.best_sol is not None and (sol.score < self.best_score or (sol.score == self.best_score and sol.dist >= self.best_dist - 1e-9)):
+                return False
+
+            self.best_sol = sol
+            self.best_score = sol.score #ObjVal has the rounding errors of the solver
+            self.best_dist = sol.dist
+            self.best_time = model.Runtime
+
+        return True
+
     def _remove_old_logs(self):
         file = Path(f"{self.out_relative_path}/logs.txt")
         if file.exists():
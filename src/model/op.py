@@ -1,4 +1,6 @@
-import math
+from multiprocessing import shared_memory
+
+import numpy as np
 
 class Vertex:
     def __init__(self, score: int, x: float, y: float):
@@ -7,38 +9,226 @@ class Vertex:
         self.y = y
 
 class OP:
-    def __init__(self, n: int, V: list[Vertex], A: list[list[float]], t_max: float, instance: str):
-        self.n = n 
+    # largest instance whose scalar lookups use a list of lists (see _build_rows)
+    LIST_ROWS_MAX_N = 1000
+
+    def __init__(self, n: int, V: list[Vertex], A: np.ndarray, t_max: float, instance: str, dtype: type=np.float64):
+        self.n = n
         self.V = V
-        self.A = A
+        self.A = np.ascontiguousarray(A, dtype=dtype) #(n, n) distance matrix
+        self.coords = np.array([(v.x, v.y) for v in V], dtype=np.float64).reshape(n, 2)
+        self.scores = np.array([v.score for v in V], dtype=np.int64)
         self.t_max = t_max
         self.instance = instance
 
+        # A_rows[i][j] (python float) is used by the scalar loops instead of indexing the numpy
+        # array element by element, it is built on first use (see __getattr__ and _build_rows)
+        self.list_rows = True
+
+        # shared memory block backing A, coords and scores (see share/attach)
+        self._shm: shared_memory.SharedMemory | None = None
+        self._shm_handle: dict | None = None
+
     @classmethod
-    def from_file(cls, instance: str):
+    def from_file(cls, instance: str, dtype: type=np.float64):
         filepath = f'instances/{instance}.txt'
 
         with open(filepath, 'r') as file:
-            lines = file.readlines()
+            t_max, _ = map(int, file.readline().split())
+            data = np.loadtxt(file, dtype=np.float64, ndmin=2)
 
-        t_max, _ = map(int, lines[0].split())
+        # swap the second vertex with the last vertex
+        # then, the inicial and end vertex will be v[0] and v[n-1] respectivelly
+        data[[1, -1]] = data[[-1, 1]]
+
+        coords = data[:, :2]
+        scores = data[:, 2].astype(np.int64)
         V = [
-            Vertex(int(score), float(x), float(y)) for x, y, score in (line.split() for line in lines[1:])
+            Vertex(score, x, y) for (x, y), score in zip(coords.tolist(), scores.tolist())
         ]
 
-        # swap the second vertex with the last vertex
-        # then, the inicial and end vertex will be v[0] and v[n-1] respectivelly
-        V[1], V[len(V) - 1] = V[len(V) - 1], V[1]
+        A = OP._euclidean_matrix(coords, dtype)
+
+        return OP(len(V), V, A, t_max, instance, dtype)
+
+    @staticmethod
+    def _euclidean_matrix(coords: np.ndarray, dtype: type, chunk_size: int=1024) -> np.ndarray:
+        """
+        Calculate the euclidean distance between every pair of vertices.
+        The rows are computed in chunks to bound the temporary memory on large instances.
+        """
+        n = len(coords)
+        x, y = coords[:, 0], coords[:, 1]
+        A = np.empty((n, n), dtype=dtype)
+
+        for start in range(0, n, chunk_size):
+            end = min(start + chunk_size, n)
+            dx = x[start:end, None] - x[None, :]
+            dy = y[start:end, None] - y[None, :]
+            A[start:end] = np.sqrt(dx * dx + dy * dy)
+
+        return A
+
+    def __getattr__(self, name: str):
+        # only called when the attribute is missing, A_rows is then a plain attribute
+        if name == "A_rows":
+            self.A_rows = self._build_rows()
+            return self.A_rows
+        raise AttributeError(name)
+
+    def _build_rows(self) -> list:
+        """
+        Rows of A for the scalar lookups: a list of lists (fastest) for the small instances
+        built in this process, otherwise zero-copy memoryviews of the rows of A, which keep
+        the memory of large instances and of the workers attached to the shared A at O(n)
+        """
+        if self.list_rows and self.n <= OP.LIST_ROWS_MAX_N:
+            return self.A.tolist()
+        return [memoryview(row) for row in self.A]
+
+    def nearest_neighbors(self, k: int, chunk_size: int=1024) -> np.ndarray:
+        """
+        Return a (n, k) matrix with the k nearest vertices of each vertex, closest first.
+        """
+        k = min(k, self.n - 1)
+        neighbors = np.empty((self.n, k), dtype=np.intp)
+
+        for start in range(0, self.n, chunk_size):
+            end = min(start + chunk_size, self.n)
+            rows = self.A[start:end]
+
+            # k + 1 closest vertices (usually including the vertex itself), sorted by distance
+            idx = np.argpartition(rows, k, axis=1)[:, :k + 1]
+            order = np.take_along_axis(rows, idx, axis=1).argsort(axis=1, kind="stable")
+            idx = np.take_along_axis(idx, order, axis=1)
+
+            for i in range(end - start):
+                neighbors[start + i] = idx[i][idx[i] != start + i][:k]
+
+        return neighbors
+
+    def feasible_arcs(self, eps: float=1e-6) -> np.ndarray:
+        """
+        Return a (m, 2) array with the arcs (i, j) that can be in a feasible path:
+        no arc enters the start vertex or leaves the end vertex, and the shortest path
+        0 -> i -> j -> n-1 through the arc fits in the budget, A[0, i] + A[i, j] + A[j, n-1] <= t_max.
+        The vertices outside the ellipse of the start and end vertices have no arcs.
+        """
+        last = self.n - 1
+        from_start = self.A[0].astype(np.float64)
+        to_end = self.A[:, last].astype(np.float64)
+
+        reachable = np.zeros(self.n, dtype=bool)
+        reachable[self.reachable_vertices(eps)] = True
+
+        feasible = from_start[:, None] + self.A + to_end[None, :] <= self.t_max + eps
+        feasible &= reachable[:, None] & reachable[None, :]
+        np.fill_diagonal(feasible, False)
+        feasible[:, 0] = False
+        feasible[last, :] = False
+
+        return np.argwhere(feasible)
+
+    def reachable_vertices(self, eps: float=1e-6) -> np.ndarray:
+        """
+        Vertices inside the ellipse of the start and end vertices, A[0, v] + A[v, n-1] <= t_max
+        """
+        return np.flatnonzero(self.A[0].astype(np.float64) + self.A[:, self.n - 1] <= self.t_max + eps)
+
+    def subproblem(self, vertices: list[int], t_max: float) -> "OP":
+        """
+        OP restricted to the given vertices with the budget t_max, vertices[0] and vertices[-1]
+        are the start and end vertices (with score 0, they are in every path)
+        """
+        idx = np.asarray(vertices)
+        V = [Vertex(self.V[v].score, self.V[v].x, self.V[v].y) for v in vertices]
+        V[0].score = V[-1].score = 0
+        return OP(len(V), V, self.A[np.ix_(idx, idx)], t_max, f"{self.instance}_sub", self.A.dtype.type)
+
+    def share(self) -> "OP":
+        """
+        Copy the distance matrix, coordinates and scores into a shared memory block
+        and return an OP backed by it.
+
+        Pickling the returned OP only sends the name of the block: the processes that
+        unpickle it attach to the same memory without copying it. The owner must call
+        unlink() when the workers are done.
+        """
+        layout, size = OP._shared_layout(self.n, self.A.dtype)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+
+        handle = {"name": shm.name, "n": self.n, "dtype": self.A.dtype.str, "t_max": self.t_max, "instance": self.instance}
+        for key, array in (("A", self.A), ("coords", self.coords), ("scores", self.scores)):
+            offset, shape, dtype = layout[key]
+            np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)[:] = array
 
-        A = [
-            [OP._euclidean_dist(V[i], V[j]) for j in range(len(V))] for i in range(len(V))
+        shared = OP.__new__(OP)
+        shared._attach(handle, shm)
+        return shared
+
+    @classmethod
+    def attach(cls, handle: dict) -> "OP":
+        op = cls.__new__(cls)
+        op._attach(handle)
+        return op
+
+    def unlink(self):
+        """
+        Remove the shared memory block, the memory is released when every process detaches from it
+        """
+        if self._shm is not None:
+            self._shm.unlink()
+
+    def _attach(self, handle: dict, shm: shared_memory.SharedMemory | None=None):
+        if shm is None:
+            try:
+                shm = shared_memory.SharedMemory(name=handle["name"], track=False)
+            except TypeError: #python < 3.13
+                shm = shared_memory.SharedMemory(name=handle["name"])
+
+        n = handle["n"]
+        layout, _ = OP._shared_layout(n, np.dtype(handle["dtype"]))
+        offset, shape, dtype = layout["A"]
+        A = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        offset, shape, dtype = layout["coords"]
+        coords = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        offset, shape, dtype = layout["scores"]
+        scores = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+
+        V = [
+            Vertex(score, x, y) for (x, y), score in zip(coords.tolist(), scores.tolist())
         ]
-        
-        return OP(len(V), V, A, t_max, instance)
-    
+        self.__init__(n, V, A, handle["t_max"], handle["instance"], A.dtype.type)
+        self.list_rows = False
+        self.coords = coords
+        self.scores = scores
+        self._shm = shm
+        self._shm_handle = handle
+
     @staticmethod
-    def _euclidean_dist(v1: Vertex, v2: Vertex) -> float:
+    def _shared_layout(n: int, dtype: np.dtype) -> tuple[dict[str, tuple[int, tuple, np.dtype]], int]:
         """
-        Calculate the euclidean distance between two vertices (v1 e v2).
+        (offset, shape, dtype) of each array in the shared memory block, and the block size
         """
-        return math.sqrt((v1.x - v2.x)**2 + (v1.y - v2.y)**2)
+        layout = {}
+        offset = 0
+        for key, shape, array_dtype in (("A", (n, n), np.dtype(dtype)), ("coords", (n, 2), np.dtype(np.float64)), ("scores", (n,), np.dtype(np.int64))):
+            layout[key] = (offset, shape, array_dtype)
+            offset += -(-int(np.prod(shape)) * array_dtype.itemsize // 8) * 8 #8 bytes aligned
+        return layout, max(offset, 1)
+
+    def __getstate__(self):
+        if self._shm is not None:
+            return {"shm_handle": self._shm_handle}
+
+        state = self.__dict__.copy()
+        state.pop("A_rows", None) #rebuilt from A
+        return state
+
+    def __setstate__(self, state):
+        if "shm_handle" in state:
+            self._attach(state["shm_handle"])
+            return
+
+        self.__dict__.update(state)
+        self.list_rows = False
@@ -0,0 +1,61 @@
+from functools import lru_cache
+from pathlib import Path
+
+import hashlib
+import json
+import shutil
+import uuid
+
+@lru_cache(maxsize=None)
+def source_version() -> str:
+    """
+    Hash of the python sources of the project, changes with any edit of the code (committed or not)
+    """
+    src = Path(__file__).resolve().parents[1]
+    h = hashlib.sha256()
+    for path in sorted(src.rglob("*.py")):
+        h.update(str(path.relative_to(src)).encode())
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+class ResultCache:
+    """
+    Content addressed cache of the result files of the runs.
+    The key hashes the instance file, the configuration of the run (including the seed)
+    and the version of the source code, a hit restores the csv files without solving.
+    """
+    FILES = ["best.csv", "best_route.csv", "improves.csv", "improve_scores.csv"]
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir)
+
+    def key(self, instance: str, config: dict) -> str:
+        h = hashlib.sha256()
+        h.update(Path(f"instances/{instance}.txt").read_bytes())
+        h.update(json.dumps(config, sort_keys=True, default=str).encode())
+        h.update(source_version().encode())
+        return h.hexdigest()
+
+    def restore(self, key: str, out: str) -> bool:
+        entry = self.cache_dir / key
+        if not entry.is_dir():
+            return False
+
+        Path(out).mkdir(parents=True, exist_ok=True)
+        for file in entry.iterdir():
+            shutil.copyfile(file, Path(out) / file.name)
+        return True
+
+    def store(self, key: str, out: str):
+        # copied to a temporary directory then renamed, an interrupted run never leaves a partial entry
+        tmp = self.cache_dir / f".{key}.{uuid.uuid4().hex}"
+        tmp.mkdir(parents=True)
+        for name in ResultCache.FILES:
+            file = Path(out) / name
+            if file.exists():
+                shutil.copyfile(file, tmp / name)
+
+        try:
+            tmp.rename(self.cache_dir / key)
+        except OSError: #already stored by another run
+            shutil.rmtree(tmp)
@@ -1,22 +1,66 @@
 from .op import OP
-from ..tabu.evaluator import Evaluator
 
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import matplotlib
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
 
+import multiprocessing as mp
 import os
+import threading
 from pathlib import Path
 
+FIGURE_POLICIES = ["block", "drop"]
+
+# instance data of the renderer processes, set by _init_renderer
+_points = None
+_scores = None
+
+def _init_renderer(points: list[tuple[float, float]], scores: list[int]):
+    global _points, _scores
+    _points = points
+    _scores = scores
+    matplotlib.use("Agg")
+
+def _render_nothing():
+    # the processes of the pool are created (and import matplotlib) on the first submits
+    pass
+
+def _render(next: list[int | None], score: int, dist: float, plot_score: bool, filepath: str):
+    render_solution_figure(_points, _scores, next, score, dist, plot_score, filepath)
+
 class ResultExporter:
-    def __init__(self, op: OP, out_relative_path: str, figure_export_option: int, plot_score: bool=True):
+    """
+    figure_workers > 0: the saved figures (figure_export_option = 2) are rendered by a pool of
+    processes, the search only sends a snapshot of the solution (next list, score and distance).
+    At most figure_queue figures are pending, when the queue is full the search waits (block)
+    or the figure is discarded (drop). close() waits for the pending figures.
+    """
+    def __init__(self, op: OP, out_relative_path: str, figure_export_option: int, plot_score: bool=True, figure_workers: int=1, figure_queue: int=16, figure_policy: str="drop"):
         self.op = op
         self.out_relative_path = out_relative_path
         self.figure_export_option = figure_export_option
         self.plot_score = plot_score
-        self.evaluator = Evaluator(op)
+
+        # coordinates and scores of the vertices, the same for every figure
+        self.points = [(v.x, v.y) for v in op.V]
+        self.scores = [v.score for v in op.V]
+
+        self.figure_workers = figure_workers
+        self.figure_policy = figure_policy
+        self.slots = threading.BoundedSemaphore(figure_queue)
+        self.pool: ProcessPoolExecutor | None = None
+        self.dropped = 0
 
         self._remove_old_figures()
 
+        if figure_export_option == 2 and figure_workers > 0:
+            # started before the search, out of its time. spawn: the search may be running
+            # other threads (gurobi, evaluation pool) when the renderers are created
+            self.pool = ProcessPoolExecutor(max_workers=figure_workers, mp_context=mp.get_context("spawn"), initializer=_init_renderer, initargs=(self.points, self.scores))
+            wait([self.pool.submit(_render_nothing) for _ in range(figure_workers)])
+
     def _remove_old_figures(self):
         folder = Path(f"{self.out_relative_path}/figures")
         folder.mkdir(parents=True, exist_ok=True)
@@ -27,71 +71,97 @@ class ResultExporter:
         if self.figure_export_option == 0 or sol is None:
             return
 
-        # Coordenadas dos pontos
-        points = [(v.x, v.y) for v in self.op.V]
-
-        # Conexões da solução
-        arcs = []
-        for i in range(len(sol.next)):
-            if sol.next[i] is not None:
-                arcs.append((i, sol.next[i]))
-
-        x, y = zip(*points)
-        scores = [v.score for v in self.op.V]
-
-        # Cria a figura e eixo
-        fig, ax = plt.subplots(figsize=(8, 8))
-
-        # Plota os pontos
-        ax.scatter(x, y, color='black', edgecolors='black', zorder=5)
-
-        # Plota as setas
-        for p1, p2 in arcs:
-            x1, y1 = points[p1]
-            x2, y2 = points[p2]
-            arrow = mpatches.FancyArrowPatch(
-                (x1, y1), (x2, y2),
-                mutation_scale=15,
-                color='red',
-                arrowstyle='->',
-                linewidth=1.5,
-                zorder=4
-            )
-            ax.add_patch(arrow)
-
-        # Rótulo dos scores
-        if self.plot_score:
-            for i, (xi, yi) in enumerate(zip(x, y)):
-                ax.text(xi, yi + 0.2, f'{scores[i]}', ha='center', fontsize=12, color='black', fontweight='bold')
-        
-        # Aspect ratio igual e sem eixos
-        ax.set_aspect('equal', adjustable='datalim')
-        ax.axis('off')
-
-        # Lucro e distância
-        lucro = self.evaluator.total_score(sol)
-        distancia = self.evaluator.total_dist(sol)
-        ax.text(
-            0, 1,
-            f"Lucro: {lucro}\nDistância: {distancia:.2f}",
-            transform=ax.transAxes,
-            fontsize=11,
-            color='black',
-            fontweight='bold',
-            verticalalignment='top',
-            horizontalalignment='left',
-            bbox=dict(facecolor='white', alpha=0.2, edgecolor='none', pad=0)
-        )
+        if self.figure_export_option == 1: #displayed by the main process
+            render_solution_figure(self.points, self.scores, sol.next, sol.score, sol.dist, self.plot_score)
+            return
+
+        filepath = f'{self.out_relative_path}/figures/{file_name}.png'
+        if self.figure_workers == 0:
+            render_solution_figure(self.points, self.scores, sol.next, sol.score, sol.dist, self.plot_score, filepath)
+            return
+
+        if not self.slots.acquire(blocking=self.figure_policy == "block"):
+            self.dropped += 1
+            return
 
-        # Ajusta layout e salva/mostra
-        plt.tight_layout()
-        if self.figure_export_option == 1:
-            plt.show()
-        else: # == 2
-            filepath = f'{self.out_relative_path}/figures/{file_name}.png'
-            directory = os.path.dirname(filepath)
-            if directory and not os.path.exists(directory):
-                os.makedirs(directory)
-            plt.savefig(filepath, bbox_inches='tight', pad_inches=0)
-
-        plt.close('all')
+        future = self.pool.submit(_render, list(sol.next), sol.score, sol.dist, self.plot_score, filepath)
+        future.add_done_callback(lambda _: self.slots.release())
+
+    def close(self):
+        """
+        Wait for the figures being rendered
+        """
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+
+        if self.dropped > 0:
+            print(f"{self.dropped} figures dropped in {self.out_relative_path} (figure queue full)")
+
+def render_solution_figure(points: list[tuple[float, float]], scores: list[int], next: list[int | None], score: int, dist: float, plot_score: bool, filepath: str | None=None):
+    """
+    Plot the path of the solution, saved in filepath or displayed (filepath = None)
+    """
+    # Conexões da solução
+    arcs = []
+    for i in range(len(next)):
+        if next[i] is not None:
+            arcs.append((i, next[i]))
+
+    x, y = zip(*points)
+
+    # Cria a figura e eixo
+    fig, ax = plt.subplots(figsize=(8, 8))
+
+    # Plota os pontos
+    ax.scatter(x, y, color='black', edgecolors='black', zorder=5)
+
+    # Plota as setas
+    for p1, p2 in arcs:
+        x1, y1 = points[p1]
+        x2, y2 = points[p2]
+        arrow = mpatches.FancyArrowPatch(
+            (x1, y1), (x2, y2),
+            mutation_scale=15,
+            color='red',
+            arrowstyle='->',
+            linewidth=1.5,
+            zorder=4
+        )
+        ax.add_patch(arrow)
+
+    # Rótulo dos scores
+    if plot_score:
+        for i, (xi, yi) in enumerate(zip(x, y)):
+            ax.text(xi, yi + 0.2, f'{scores[i]}', ha='center', fontsize=12, color='black', fontweight='bold')
+    
+    # Aspect ratio igual e sem eixos
+    ax.set_aspect('equal', adjustable='datalim')
+    ax.axis('off')
+
+    # Lucro e distância
+    lucro = score
+    distancia = dist
+    ax.text(
+        0, 1,
+        f"Lucro: {lucro}\nDistância: {distancia:.2f}",
+        transform=ax.transAxes,
+        fontsize=11,
+        color='black',
+        fontweight='bold',
+        verticalalignment='top',
+        horizontalalignment='left',
+        bbox=dict(facecolor='white', alpha=0.2, edgecolor='none', pad=0)
+    )
+
+    # Ajusta layout e salva/mostra
+    plt.tight_layout()
+    if filepath is None:
+        plt.show()
+    else:
+        directory = os.path.dirname(filepath)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        plt.savefig(filepath, bbox_inches='tight', pad_inches=0)
+
+    plt.close('all')
@@ -1,77 +1,122 @@
-from typing import Any, Tuple
+from .op import OP
+
 import gurobipy as gp
+import math
+import numpy as np
 
 class Solution:
-    def __init__(self, n: int):
-        self.n = n
-        self.prev: list[int | None] = [None] * n #list for the previous vertex
-        self.next: list[int | None] = [None] * n #list for the next vertex
+    # when enabled, every mutation checks the cached dist/score against a full recomputation
+    debug = False
+
+    def __init__(self, op: OP):
+        self.op = op
+        self.n = op.n
+        self.prev: list[int | None] = [None] * self.n #list for the previous vertex
+        self.next: list[int | None] = [None] * self.n #list for the next vertex
+        self.dist = 0.0 #total distance of the path, updated by every mutation
+        self.score = 0 #total score of the path, updated by every mutation
+        self.route: list[int] = [] #vertices of the path in visiting order
+        self.pos: list[int | None] = [None] * self.n #index of each vertex in the route
+        self.unvisited: set[int] = set(range(self.n)) #vertices outside the path
+        self.changed: set[int] | None = None #vertices whose next changed, recorded when not None (see InsertionCache)
 
     @classmethod
-    def create_trivial_path(cls, n: int) -> "Solution":
+    def create_trivial_path(cls, op: OP) -> "Solution":
         """
         create the initial path v_1 -> v_n
         """
-        sol = cls(n)
-        sol.next[0] = n - 1
-        sol.prev[n - 1] = 0
+        sol = cls(op)
+        sol.next[0] = op.n - 1
+        sol.prev[op.n - 1] = 0
+        sol._recompute()
         return sol
 
     @classmethod
     def copy(cls, other_sol: "Solution") -> "Solution":
-        new_sol = cls(other_sol.n)
+        new_sol = cls(other_sol.op)
         new_sol.next = other_sol.next[:]
         new_sol.prev = other_sol.prev[:]
+        new_sol.dist = other_sol.dist
+        new_sol.score = other_sol.score
+        new_sol.route = other_sol.route[:]
+        new_sol.pos = other_sol.pos[:]
+        new_sol.unvisited = set(other_sol.unvisited)
         return new_sol
     
     @classmethod
-    def from_gurobi(cls, n: int, x: gp.tupledict[Tuple[Any, ...], gp.Var]) -> "Solution":
-        sol = cls(n)
-        for i in range(n):
-            for j in range(n):
-                if x[i,j].X == 1.0:
-                    sol.next[i] = j
-                    sol.prev[j] = i
+    def from_next(cls, op: OP, next: list[int | None]) -> "Solution":
+        """
+        Build the solution from its list of next vertices (e.g. received from another process)
+        """
+        sol = cls(op)
+        sol.next = list(next)
+        for i, j in enumerate(sol.next):
+            if j is not None:
+                sol.prev[j] = i
+        sol._recompute()
         return sol
-    
+
     @classmethod
-    def from_arcs(cls, n: int, arcs: list[tuple[int,int]]) -> "Solution":
-        sol = cls(n)
-        print("here, ", sol.next)
-        for i, j in arcs:
+    def from_route(cls, op: OP, route: list[int]) -> "Solution":
+        """
+        Build the solution from the vertices of the path in visiting order
+        """
+        next = [None] * op.n
+        for i, j in zip(route, route[1:]):
+            next[i] = j
+        return cls.from_next(op, next)
+
+    @classmethod
+    def from_gurobi(cls, op: OP, arcs: np.ndarray, x: gp.MVar) -> "Solution":
+        """
+        arcs: (m, 2) array with the arc of each variable of x
+        """
+        sol = cls(op)
+        for i, j in arcs[x.X > 0.5].tolist():
             sol.next[i] = j
             sol.prev[j] = i
-        for i in range(len(sol.next)):
-            if sol.next[i] == 0:
-                sol.next[i] = None
-        for i in range(len(sol.prev)):
-            if sol.prev[i] == 0:
-                sol.prev[i] = None
+        sol._recompute()
         return sol
     
+    @classmethod
+    def from_arcs(cls, op: OP, arcs: list[tuple[int,int]]) -> "Solution":
+        """
+        Build the solution from the arcs of the path (e.g. an incumbent of the ilp solver)
+        """
+        next = [None] * op.n
+        for i, j in arcs:
+            next[i] = j
+        return cls.from_next(op, next)
+    
     def get_vertices(self) -> list[int]:
-        res = []
-        cur = 0
-
-        while cur is not None:
-            res.append(cur)
-            cur = self.next[cur]
-        
-        return res
+        """
+        Return the vertices of the path in visiting order.
+        The returned list is the internal route array, it must not be modified.
+        """
+        return self.route
     
     def get_remaining_vertices(self) -> list[int]:
-        total_vertices = set(range(len(self.next)))
-        sol_vertices = set(self.get_vertices())
-        return list(total_vertices - sol_vertices)
+        """
+        Return the vertices outside the path, in the iteration order of the unvisited set
+        (the ties of the strict argmax of the moves go to the first candidate in this order)
+        """
+        return list(self.unvisited)
     
     def are_all_vertices_in_path(self) -> bool:
-        return len(self.get_vertices()) == self.n
+        return len(self.route) == self.n
+
+    def is_after(self, v1: int, v2: int) -> bool:
+        """
+        Return True if v2 is visited after v1 in the path
+        """
+        return self.pos[v2] > self.pos[v1]
     
     def add_vertex_after(self, x: int, v1: int):
         """
         Add vertex x after the vertices v1
         """
         v2 = self.next[v1]
+        A = self.op.A_rows
 
         self.next[v1] = x
         self.prev[x] = v1
@@ -79,9 +124,24 @@ class Solution:
         self.prev[v2] = x
         self.next[x] = v2
 
+        self.dist += A[v1][x] + A[x][v2] - A[v1][v2]
+        self.score += self.op.V[x].score
+
+        i = self.pos[v1] + 1
+        self.route.insert(i, x)
+        self.unvisited.discard(x)
+        self._reindex(i, len(self.route))
+
+        if self.changed is not None:
+            self.changed.update((v1, x))
+
+        if Solution.debug:
+            self._check_consistency()
+
     def remove_vertex(self, v: int):
         prev = self.prev[v]
         next = self.next[v]
+        A = self.op.A_rows
 
         self.next[prev] = next
         self.prev[next] = prev
@@ -89,6 +149,21 @@ class Solution:
         self.prev[v] = None
         self.next[v] = None
 
+        self.dist += A[prev][next] - A[prev][v] - A[v][next]
+        self.score -= self.op.V[v].score
+
+        i = self.pos[v]
+        del self.route[i]
+        self.pos[v] = None
+        self.unvisited.add(v)
+        self._reindex(i, len(self.route))
+
+        if self.changed is not None:
+            self.changed.update((prev, v))
+
+        if Solution.debug:
+            self._check_consistency()
+
     def add_and_remove_vertex(self, in_v: int, insert_pos: int, out_v: int):
         self.remove_vertex(out_v)
         self.add_vertex_after(in_v, insert_pos)
@@ -97,6 +172,7 @@ class Solution:
         prev_of_x = self.prev[x]
         next_of_x = self.next[x]
         next_of_rel_pos = self.next[rel_pos]
+        A = self.op.A_rows
 
         self.next[prev_of_x] = next_of_x
         self.prev[next_of_x] = prev_of_x
@@ -107,6 +183,22 @@ class Solution:
         self.next[x] = next_of_rel_pos
         self.prev[x] = rel_pos
 
+        self.dist += A[prev_of_x][next_of_x] + A[rel_pos][x] + A[x][next_of_rel_pos] \
+            - A[prev_of_x][x] - A[x][next_of_x] - A[rel_pos][next_of_rel_pos]
+
+        i = self.pos[x]
+        del self.route[i]
+        # rel_pos shifts one position to the left when it is after x
+        j = self.pos[rel_pos] + 1 if self.pos[rel_pos] < i else self.pos[rel_pos]
+        self.route.insert(j, x)
+        self._reindex(min(i, j), max(i, j) + 1)
+
+        if self.changed is not None:
+            self.changed.update((prev_of_x, rel_pos, x))
+
+        if Solution.debug:
+            self._check_consistency()
+
     def twoOpt(self, v1: int, v2: int):
         """
         Apply a 2-opt move in place.
@@ -136,12 +228,16 @@ class Solution:
         """
         Reverse the internal segment of the path between 'start' and 'end' (inclusive).
         Assumes that 'start' is not the first vertex and 'end' is not the last vertex.
+        The distance matrix is symmetric, so only the two border arcs change the distance.
         """
         assert self.prev[start] is not None, "start cannot be the first vertex"
         assert self.next[end] is not None, "end cannot be the last vertex"
 
         before_start = self.prev[start]
         after_end = self.next[end]
+        A = self.op.A_rows
+
+        self.dist += A[before_start][end] + A[start][after_end] - A[before_start][start] - A[end][after_end]
 
         prev = after_end
         cur = start
@@ -161,6 +257,16 @@ class Solution:
         self.next[start] = after_end
         self.prev[after_end] = start
 
+        i, j = self.pos[start], self.pos[end]
+        self.route[i:j + 1] = reversed(self.route[i:j + 1])
+        self._reindex(i, j + 1)
+
+        if self.changed is not None:
+            self.changed.update(self.route[i - 1:j + 1]) #before_start and the reversed segment
+
+        if Solution.debug:
+            self._check_consistency()
+
     def _swap_adjacent_segments(self, v1: int, v2: int, v3: int, v4: int):
         """
         Swap the position of two adjacent segments S1 S2:
@@ -168,6 +274,13 @@ class Solution:
         """
         prev_v1 = self.prev[v1]
         next_v4 = self.next[v4]
+        A = self.op.A_rows
+
+        self.dist += A[v4][v1] - A[v2][v3]
+        if prev_v1 is not None:
+            self.dist += A[prev_v1][v3] - A[prev_v1][v1]
+        if next_v4 is not None:
+            self.dist += A[v2][next_v4] - A[v4][next_v4]
 
         if prev_v1 is not None:
             self.next[prev_v1] = v3
@@ -182,6 +295,75 @@ class Solution:
         if next_v4 is not None:
             self.prev[next_v4] = v2
 
+        i, m, j = self.pos[v1], self.pos[v2], self.pos[v4]
+        self.route[i:j + 1] = self.route[m + 1:j + 1] + self.route[i:m + 1]
+        self._reindex(i, j + 1)
+
+        if self.changed is not None:
+            self.changed.update((v4, v2) if prev_v1 is None else (prev_v1, v4, v2))
+
+        if Solution.debug:
+            self._check_consistency()
+
+    def _reindex(self, start: int, end: int):
+        """
+        Update the position index of the route entries in [start, end)
+        """
+        route, pos = self.route, self.pos
+        for i in range(start, end):
+            pos[route[i]] = i
+
+    def _walk(self) -> list[int]:
+        """
+        Full O(n) walk of the linked list from the first vertex.
+        """
+        res = []
+        cur = 0
+
+        while cur is not None:
+            res.append(cur)
+            cur = self.next[cur]
+        
+        return res
+
+    def _compute_dist(self) -> float:
+        """
+        Full O(n) recomputation of the path distance.
+        """
+        total_dist = 0.0
+        for u, v in enumerate(self.next):
+            if v is not None:
+                total_dist += self.op.A_rows[u][v]
+        return total_dist
+
+    def _compute_score(self) -> int:
+        """
+        Full O(n) recomputation of the path score.
+        """
+        total_score = 0
+        for v in self._walk():
+            total_score += self.op.V[v].score
+        return total_score
+
+    def _recompute(self):
+        """
+        Rebuild the cached state from the next/prev lists.
+        """
+        self.dist = self._compute_dist()
+        self.score = self._compute_score()
+        self.route = self._walk()
+        self.pos = [None] * self.n
+        self._reindex(0, len(self.route))
+        self.unvisited = set(range(self.n)) - set(self.route)
+
+    def _check_consistency(self):
+        dist = self._compute_dist()
+        score = self._compute_score()
+        assert math.isclose(self.dist, dist, rel_tol=1e-9, abs_tol=1e-6), f"cached dist {self.dist} differs from {dist}"
+        assert self.score == score, f"cached score {self.score} differs from {score}"
+        assert self.route == self._walk(), "cached route differs from the linked list"
+        assert all(self.pos[v] == i for i, v in enumerate(self.route)), "inconsistent position index"
+        assert len(self.route) + len(self.unvisited) == self.n and self.unvisited.isdisjoint(self.route), "inconsistent unvisited set"
 
     def get_vertices_reverse(self) -> list[int]:
         """
@@ -0,0 +1,293 @@
+from .tabu.tabu_search import TabuSearch
+from .tabu.lns import LNS
+from .ilp.solver import ILPSolver
+from .ilp.warm_start import warm_start_solution, best_route_files_version, WARM_STARTS
+from .ilp.portfolio import solve_portfolio
+from .model.op import OP
+from .model.result_exporter import ResultExporter
+from .model.execution_context import ExecutionContext
+from .model.result_cache import ResultCache
+
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from functools import lru_cache
+
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+# config args (same names as the run_tabu_search flags) -> TabuSearch parameters
+TABU_ARGS = {
+    "first_improve": "ls_first_improve",
+    "diversification": "enable_diversification",
+    "intensification": "enable_intensification",
+    "batch_eval": "batch_eval",
+    "neighbors": "neighbors",
+    "dont_look_bits": "dont_look_bits",
+    "insertion_cache": "insertion_cache",
+    "eval_threads": "eval_threads",
+}
+
+# config args (same names as the run_tabu_search flags) -> LNS parameters, used with "lns": true
+LNS_ARGS = {
+    "lns_segment": "segment_size",
+    "lns_neighbors": "neighbors",
+    "lns_time": "time_limit",
+}
+
+# config args (same names as the run_ilp flags) -> ILPSolver parameters
+ILP_ARGS = {
+    "formulation": "formulation",
+    "fractional_cuts": "fractional_cuts",
+}
+
+@lru_cache(maxsize=None)
+def load_instance(instance: str, float32: bool=False) -> OP:
+    """
+    Each worker process reads an instance only once
+    """
+    return OP.from_file(instance, dtype=np.float32 if float32 else np.float64)
+
+def build_jobs(matrix: dict) -> list[dict]:
+    """
+    Expand the experiment matrix (instances x configs x seeds x targets) into jobs.
+
+    The results of a job are saved in <out>/<instance>/<config>, the seed and the target are
+    appended to the config name only when the matrix has more than one of them.
+    """
+    out = matrix.get("out", "results")
+    seeds = matrix.get("seeds", [0])
+    jobs = []
+
+    for instance in matrix["instances"]:
+        if isinstance(instance, str):
+            instance = {"name": instance}
+
+        targets = instance.get("targets", [instance.get("target", 99999999)])
+
+        for config in matrix["configs"]:
+            for seed in seeds:
+                for target in targets:
+                    config_name = config["name"]
+                    if len(seeds) > 1:
+                        config_name += f"-s{seed}"
+                    if len(targets) > 1:
+                        config_name += f"-t{target}"
+
+                    jobs.append({
+                        "instance": instance["name"],
+                        "solver": config.get("solver", "tabu"),
+                        "config_name": config_name,
+                        "out": f"{out}/{instance['name']}/{config_name}",
+                        "args": config.get("args", {}),
+                        "seed": seed,
+                        "target": target,
+                        "max_time": config.get("max_time", matrix.get("max_time", 60)),
+                        "figure_export_option": matrix.get("figure_export_option", 0),
+                        "export_figure_level": matrix.get("export_figure_level", 0),
+                        "plot_score": instance.get("plot_score", matrix.get("plot_score", True)),
+                        "figure_workers": matrix.get("figure_workers", 1),
+                        "figure_queue": matrix.get("figure_queue", 16),
+                        "figure_policy": matrix.get("figure_policy", "drop"),
+                        "threads": job_threads(config),
+                    })
+
+    return jobs
+
+def job_threads(config: dict) -> int:
+    """
+    Number of cores used by a job: the "threads" of the config for the ilp (gurobi Threads
+    parameter, default 1), the evaluation threads for the tabu search, and both for the portfolio
+    """
+    if config.get("solver", "tabu") == "ilp":
+        return int(config.get("threads", 1))
+    if config.get("solver", "tabu") == "portfolio":
+        return int(config.get("threads", 1)) + int(config.get("args", {}).get("eval_threads", 1))
+    return int(config.get("args", {}).get("eval_threads", 1))
+
+def available_cpus() -> list[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count()))
+
+def run_job(job: dict, cpus: list[int]) -> tuple[dict, int | float | None, float | None, float | None]:
+    # the job only runs on the cores granted by the scheduler
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+
+    op = load_instance(job["instance"], job["args"].get("float32", False))
+    out = job["out"]
+
+    context = ExecutionContext(op, job["config_name"], out, verbose=False)
+    exporter = ResultExporter(op, out, job["figure_export_option"], job["plot_score"], job["figure_workers"], job["figure_queue"], job["figure_policy"])
+
+    if job["solver"] == "ilp":
+        unknown = set(job["args"]) - set(ILP_ARGS) - {"warm_start", "warm_start_time"}
+        if unknown:
+            raise ValueError(f"unknown ilp args: {sorted(unknown)}")
+
+        ilp_kwargs = {ILP_ARGS[key]: value for key, value in job["args"].items() if key in ILP_ARGS}
+        if "warm_start" in job["args"]:
+            warm_start = job["args"]["warm_start"].format(instance=job["instance"])
+            ilp_kwargs["initial_sol"] = warm_start_solution(op, warm_start, out, job["args"].get("warm_start_time", 5), job["seed"])
+        solver = ILPSolver(op=op, context=context, exporter=exporter, max_time_sec=job["max_time"], threads=len(cpus), **ilp_kwargs)
+        solver.solve()
+
+        context.export_best_sol_csv()
+        context.export_best_route_csv()
+        context.export_improves_csv()
+    elif job["solver"] == "portfolio":
+        unknown = set(job["args"]) - set(TABU_ARGS) - set(ILP_ARGS)
+        if unknown:
+            raise ValueError(f"unknown portfolio args: {sorted(unknown)}")
+
+        ilp_kwargs = {ILP_ARGS[key]: value for key, value in job["args"].items() if key in ILP_ARGS}
+        ts_kwargs = {TABU_ARGS[key]: value for key, value in job["args"].items() if key in TABU_ARGS}
+        ts_kwargs.setdefault("ls_first_improve", False)
+        ts_kwargs.setdefault("enable_diversification", False)
+        ts_kwargs.setdefault("enable_intensification", False)
+
+        # the cores granted beyond the evaluation threads of the tabu search are used by gurobi
+        threads = max(len(cpus) - ts_kwargs.get("eval_threads", 1), 1)
+        solve_portfolio(op, context, exporter, job["max_time"], threads=threads, export_fig_lvl=job["export_figure_level"], rng=job["seed"], **ilp_kwargs, **ts_kwargs)
+
+        context.export_improves_csv()
+        context.export_improve_scores_csv()
+        context.export_best_sol_csv()
+        context.export_best_route_csv()
+    else:
+        unknown = set(job["args"]) - set(TABU_ARGS) - set(LNS_ARGS) - {"float32", "lns"}
+        if unknown:
+            raise ValueError(f"unknown tabu search args: {sorted(unknown)}")
+
+        ts_kwargs = {TABU_ARGS[key]: value for key, value in job["args"].items() if key in TABU_ARGS}
+        if "eval_threads" in ts_kwargs:
+            ts_kwargs["eval_threads"] = len(cpus)
+        ts_kwargs.setdefault("ls_first_improve", False)
+        ts_kwargs.setdefault("enable_diversification", False)
+        ts_kwargs.setdefault("enable_intensification", False)
+        if job["args"].get("lns", False):
+            lns_kwargs = {LNS_ARGS[key]: value for key, value in job["args"].items() if key in LNS_ARGS}
+            ts_kwargs["lns"] = LNS(op, rng=job["seed"], **lns_kwargs)
+
+        ts = TabuSearch(op, context, exporter, max_time_sec=job["max_time"], target=job["target"], export_fig_lvl=job["export_figure_level"], rng=job["seed"], **ts_kwargs)
+        ts.solve()
+
+        context.export_improves_csv()
+        context.export_improve_scores_csv()
+        context.export_best_sol_csv()
+        context.export_best_route_csv()
+
+    exporter.close()
+    return job, context.best_score, context.best_dist, context.best_time
+
+def warm_start_pattern(job: dict) -> str | None:
+    """
+    Pattern of the result directories read by the warm start of an ilp job (None if it doesn't read results)
+    """
+    warm_start = job["args"].get("warm_start") if job["solver"] == "ilp" else None
+    if warm_start is None or warm_start in WARM_STARTS:
+        return None
+    return warm_start.format(instance=job["instance"])
+
+def job_cache_key(cache: ResultCache, job: dict) -> str:
+    # the output directory and the figure workers do not change the results, neither do the
+    # threads of a tabu search (evaluation threads), unlike the gurobi threads
+    ignored = {"out", "figure_workers", "figure_queue", "figure_policy"}
+    if job["solver"] == "tabu":
+        ignored.add("threads")
+    config = {k: v for k, v in job.items() if k not in ignored}
+
+    pattern = warm_start_pattern(job)
+    if pattern is not None:
+        config["warm_start_routes"] = best_route_files_version(pattern)
+
+    return cache.key(job["instance"], config)
+
+def run_jobs(jobs: list[dict], cpus: list[int], cache: ResultCache | None=None):
+    """
+    Run the jobs in order, starting the next one only when there are enough free cores
+    for its threads, so that the running jobs never use more than the given cores.
+    Each job is pinned to its cores (a job needing more threads than the budget gets all of them).
+    The jobs found in the cache are restored without running, the ones warm started from
+    other results are looked up when they are started (the results may change during the run).
+    """
+    free_cpus = list(cpus)
+    pending = []
+    running = {}
+    finished = failed = 0
+
+    def restore(job: dict, key: str) -> bool:
+        nonlocal finished
+        if not cache.restore(key, job["out"]):
+            return False
+        finished += 1
+        print(f"♻️ [{finished}/{len(jobs)}] {job['instance']} {job['config_name']}: restored from the cache")
+        return True
+
+    for job in jobs:
+        if cache is None or warm_start_pattern(job) is not None or not restore(job, job_cache_key(cache, job)):
+            pending.append(job)
+
+    with ProcessPoolExecutor(max_workers=len(cpus)) as pool:
+        while pending or running:
+            while pending and min(pending[0]["threads"], len(cpus)) <= len(free_cpus):
+                job = pending.pop(0)
+
+                # the key is computed before the run, with the results read by its warm start
+                key = None if cache is None else job_cache_key(cache, job)
+                if key is not None and warm_start_pattern(job) is not None and restore(job, key):
+                    continue
+
+                threads = min(job["threads"], len(cpus))
+                granted, free_cpus = free_cpus[:threads], free_cpus[threads:]
+                running[pool.submit(run_job, job, granted)] = (job, granted, key)
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job, granted, key = running.pop(future)
+                free_cpus += granted
+                finished += 1
+                try:
+                    _, score, dist, time_sec = future.result()
+                    if cache is not None:
+                        cache.store(key, job["out"])
+                    dist = "" if dist is None else f"{dist:.2f}"
+                    time_sec = "" if time_sec is None else f"{time_sec:.2f}"
+                    print(f"✅ [{finished}/{len(jobs)}] {job['instance']} {job['config_name']} ({len(granted)} threads): score={score}, dist={dist}, time={time_sec}")
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ [{finished}/{len(jobs)}] {job['instance']} {job['config_name']}: {e!r}")
+
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--matrix", required=True, help="JSON file with the experiment matrix (see ./experiments)")
+    parser.add_argument("--threads", type=int, default=0, help="Budget of threads (cores) of the experiments running at the same time. 0: all the available cores (default = 0)")
+    parser.add_argument("--cache_dir", help="Directory of the result cache, the experiments already in it are restored instead of running again (default = the 'cache_dir' of the matrix, or disabled)")
+    parser.add_argument("--out", help="Base output directory (default = the 'out' of the matrix, or ./results)")
+
+    args = parser.parse_args()
+
+    with open(args.matrix, "r") as file:
+        matrix = json.load(file)
+    if args.out is not None:
+        matrix["out"] = args.out
+    cache_dir = args.cache_dir or matrix.get("cache_dir")
+
+    jobs = build_jobs(matrix)
+    cpus = available_cpus()
+    if args.threads > 0:
+        cpus = cpus[:args.threads]
+
+    print(f"Running {len(jobs)} experiments from {args.matrix} with a budget of {len(cpus)} threads")
+
+    start = time.time()
+    failed = run_jobs(jobs, cpus, ResultCache(cache_dir) if cache_dir else None)
+
+    print(f"🚀 Finished {len(jobs) - failed}/{len(jobs)} experiments in {time.time() - start:.2f}s")
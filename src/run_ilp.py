@@ -1,9 +1,12 @@
-from .ilp.solver import ILPSolver
+from .ilp.solver import ILPSolver, FORMULATIONS
+from .ilp.warm_start import warm_start_solution, best_route_files_version, WARM_STARTS
 from .model.op import OP
-from .model.result_exporter import ResultExporter
+from .model.result_exporter import ResultExporter, FIGURE_POLICIES
 from .model.execution_context import ExecutionContext
+from .model.result_cache import ResultCache
 
 import argparse
+import sys
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -11,8 +14,17 @@ if __name__ == "__main__":
     parser.add_argument("--out", required=True, help="Output directory")
     parser.add_argument("--max_time", type=int, default=60, help="Maximum runtime (seconds)")
     parser.add_argument("--figure_export_option", type=int, default=0, help="0: don't display/save. 1: display figures in runtime. 2: save figures in filesystem")
+    parser.add_argument("--figure_workers", type=int, default=1, help="Processes rendering the saved figures (--figure_export_option 2) in background. 0: render in the search (default = 1)")
+    parser.add_argument("--figure_queue", type=int, default=16, help="Maximum number of figures waiting to be rendered (default = 16)")
+    parser.add_argument("--figure_policy", choices=FIGURE_POLICIES, default="drop", help="When the figure queue is full: wait for a free slot (block) or discard the figure (drop) (default = drop)")
     parser.add_argument("--plot_score", action="store_true", help="Whether the vertices' scores should be plotted in the exported figures (default = true)")
     parser.add_argument("--config_name", required=True, help="Name to be used to save in the result files")
+    parser.add_argument("--cache_dir", help="Directory of the result cache, a run with the same instance, options and source code restores its csv files from it (default = disabled)")
+    parser.add_argument("--threads", type=int, default=0, help="Number of threads used by gurobi. 0: all the cores (default = 0)")
+    parser.add_argument("--formulation", choices=FORMULATIONS, default="mtz", help="Subtour elimination. mtz: Miller-Tucker-Zemlin constraints. sec: subtour elimination cuts added lazily in the callback (default = mtz)")
+    parser.add_argument("--warm_start", help="Initial solution of the solver (MIP start and cutoff). constructive: constructive heuristic of the tabu search. tabu: tabu search running for --warm_start_time seconds. Otherwise a pattern of previous result directories, the best route of their best_route.csv files is used, e.g. 'results/{instance}/tabu*' (default = no warm start)")
+    parser.add_argument("--warm_start_time", type=int, default=5, help="Maximum runtime (seconds) of the tabu search of --warm_start tabu (default = 5)")
+    parser.add_argument("--fractional_cuts", action="store_true", help="With --formulation sec, also separate the subtour cuts violated by the fractional solution of the root node (max-flow)")
 
     args = parser.parse_args()
 
@@ -20,8 +32,17 @@ if __name__ == "__main__":
     out = str(args.out)
     max_time = int(args.max_time)
     config_name = str(args.config_name)
-    figure_export_option = str(args.figure_export_option)
+    figure_export_option = int(args.figure_export_option)
     plot_score = bool(args.plot_score)
+    figure_workers = int(args.figure_workers)
+    figure_queue = int(args.figure_queue)
+    figure_policy = str(args.figure_policy)
+    threads = int(args.threads)
+    cache_dir = args.cache_dir
+    formulation = str(args.formulation)
+    fractional_cuts = bool(args.fractional_cuts)
+    warm_start = None if args.warm_start is None else str(args.warm_start).format(instance=instance)
+    warm_start_time = int(args.warm_start_time)
     
     print(f"Running ILP solver with options:")
     print(f"Instance: {instance}")
@@ -29,15 +50,44 @@ if __name__ == "__main__":
     print(f"Tempo máximo: {max_time}")
     print(f"Figure export option: {figure_export_option}")
     print(f"Plot score: {plot_score}")
+    print(f"Figure workers: {figure_workers} (queue: {figure_queue}, policy: {figure_policy})")
     print(f"Config name: {config_name}")
+    print(f"Threads: {threads}")
+    print(f"Cache dir: {cache_dir}")
+    print(f"Formulation: {formulation}")
+    print(f"Fractional cuts: {fractional_cuts}")
+    print(f"Warm start: {warm_start}")
+    print(f"Warm start time: {warm_start_time}")
+
+    cache = ResultCache(cache_dir) if cache_dir else None
+    if cache is not None:
+        config = {"solver": "ilp", **{k: v for k, v in vars(args).items() if k not in ("out", "cache_dir", "figure_workers", "figure_queue", "figure_policy")}}
+        if warm_start is not None and warm_start not in WARM_STARTS:
+            # the initial solution is read from the results of other runs
+            config["warm_start_routes"] = best_route_files_version(warm_start)
+        cache_key = cache.key(instance, config)
+        if cache.restore(cache_key, out):
+            print(f"Results restored from the cache: {cache_key}")
+            sys.exit(0)
 
     op = OP.from_file(instance)
     context = ExecutionContext(op, config_name, out)
-    exporter = ResultExporter(op, out_relative_path=out, figure_export_option=figure_export_option, plot_score=plot_score)
+    exporter = ResultExporter(op, out_relative_path=out, figure_export_option=figure_export_option, plot_score=plot_score, figure_workers=figure_workers, figure_queue=figure_queue, figure_policy=figure_policy)
+
+    initial_sol = None
+    if warm_start is not None:
+        initial_sol = warm_start_solution(op, warm_start, out, warm_start_time)
+        if initial_sol is None:
+            print(f"No initial solution found in {warm_start}")
 
-    solver = ILPSolver(op=op, context=context, exporter=exporter, max_time_sec=max_time)
+    solver = ILPSolver(op=op, context=context, exporter=exporter, max_time_sec=max_time, threads=threads, formulation=formulation, fractional_cuts=fractional_cuts, initial_sol=initial_sol)
 
     solver.solve()
+    exporter.close()
     
     context.export_best_sol_csv()
+    context.export_best_route_csv()
     context.export_improves_csv()
+
+    if cache is not None:
+        cache.store(cache_key, out)
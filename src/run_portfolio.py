@@ -0,0 +1,94 @@
+from .ilp.portfolio import solve_portfolio
+from .ilp.solver import FORMULATIONS
+from .model.op import OP
+from .model.result_exporter import ResultExporter, FIGURE_POLICIES
+from .model.execution_context import ExecutionContext
+from .model.result_cache import ResultCache
+
+import argparse
+import sys
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--instance", required=True, help="Instance name (located in the ./instances directory)")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--first_improve", action="store_true", help="Enable first-improve strategy in local-search (default = best-improve)")
+    parser.add_argument("--intensification", action="store_true", help="Enable intensification (default = disabled)")
+    parser.add_argument("--diversification", action="store_true", help="Enable diversification (default = disabled)")
+    parser.add_argument("--threads", type=int, default=0, help="Number of threads used by gurobi. 0: all the cores (default = 0)")
+    parser.add_argument("--formulation", choices=FORMULATIONS, default="mtz", help="Subtour elimination. mtz: Miller-Tucker-Zemlin constraints. sec: subtour elimination cuts added lazily in the callback (default = mtz)")
+    parser.add_argument("--fractional_cuts", action="store_true", help="With --formulation sec, also separate the subtour cuts violated by the fractional solution of the root node (max-flow)")
+    parser.add_argument("--max_time", type=int, default=60, help="Maximum runtime (seconds)")
+    parser.add_argument("--figure_export_option", type=int, default=0, help="0: don't display/save. 1: display figures in runtime. 2: save figures in filesystem")
+    parser.add_argument("--export_figure_level", type=int, default=0, help="0: export only improve solutions. 1: display all solutions during the tabu search")
+    parser.add_argument("--figure_workers", type=int, default=1, help="Processes rendering the saved figures (--figure_export_option 2) in background. 0: render in the search (default = 1)")
+    parser.add_argument("--figure_queue", type=int, default=16, help="Maximum number of figures waiting to be rendered (default = 16)")
+    parser.add_argument("--figure_policy", choices=FIGURE_POLICIES, default="drop", help="When the figure queue is full: wait for a free slot (block) or discard the figure (drop) (default = drop)")
+    parser.add_argument("--plot_score", action="store_true", help="Whether the vertices' scores should be plotted in the exported figures (default = true)")
+    parser.add_argument("--config_name", required=True, help="Name to be used to save in the result files")
+    parser.add_argument("--rng", type=int, default=0, help="Seed number for random generator")
+    parser.add_argument("--cache_dir", help="Directory of the result cache, a run with the same instance, options and source code restores its csv files from it (default = disabled)")
+
+    args = parser.parse_args()
+
+    instance = str(args.instance)
+    out = str(args.out)
+    first_improve = bool(args.first_improve)
+    enable_intensification = bool(args.intensification)
+    enable_diversification = bool(args.diversification)
+    threads = int(args.threads)
+    formulation = str(args.formulation)
+    fractional_cuts = bool(args.fractional_cuts)
+    max_time = int(args.max_time)
+    figure_export_option = int(args.figure_export_option)
+    export_figure_level = int(args.export_figure_level)
+    plot_score = bool(args.plot_score)
+    figure_workers = int(args.figure_workers)
+    figure_queue = int(args.figure_queue)
+    figure_policy = str(args.figure_policy)
+    config_name = str(args.config_name)
+    rng = int(args.rng)
+    cache_dir = args.cache_dir
+
+    print(f"Running tabu search + ILP portfolio with options:")
+    print(f"Instance: {instance}")
+    print(f"Output dir: {out}")
+    print(f"First improve: {first_improve}")
+    print(f"Intensification: {enable_intensification}")
+    print(f"Diversification: {enable_diversification}")
+    print(f"Threads: {threads}")
+    print(f"Formulation: {formulation}")
+    print(f"Fractional cuts: {fractional_cuts}")
+    print(f"Tempo máximo: {max_time}")
+    print(f"Figure export option: {figure_export_option}")
+    print(f"Export figure level: {export_figure_level}")
+    print(f"Plot score: {plot_score}")
+    print(f"Figure workers: {figure_workers} (queue: {figure_queue}, policy: {figure_policy})")
+    print(f"Config name: {config_name}")
+    print(f"Seed RNG: {rng}")
+    print(f"Cache dir: {cache_dir}")
+
+    cache = ResultCache(cache_dir) if cache_dir else None
+    if cache is not None:
+        cache_key = cache.key(instance, {"solver": "portfolio", **{k: v for k, v in vars(args).items() if k not in ("out", "cache_dir", "figure_workers", "figure_queue", "figure_policy")}})
+        if cache.restore(cache_key, out):
+            print(f"Results restored from the cache: {cache_key}")
+            sys.exit(0)
+
+    op = OP.from_file(instance)
+    context = ExecutionContext(op, config_name, out)
+    exporter = ResultExporter(op, out, figure_export_option, plot_score, figure_workers, figure_queue, figure_policy)
+
+    solve_portfolio(
+        op, context, exporter, max_time, threads=threads, formulation=formulation, fractional_cuts=fractional_cuts,
+        ls_first_improve=first_improve, enable_diversification=enable_diversification, enable_intensification=enable_intensification, export_fig_lvl=export_figure_level, rng=rng
+    )
+    exporter.close()
+
+    context.export_improves_csv()
+    context.export_improve_scores_csv()
+    context.export_best_sol_csv()
+    context.export_best_route_csv()
+
+    if cache is not None:
+        cache.store(cache_key, out)
@@ -1,39 +1,83 @@
 from .tabu.tabu_search import TabuSearch
+from .tabu.parallel import solve_parallel, TOPOLOGIES
+from .tabu.lns import LNS
 from .model.op import OP
-from .model.result_exporter import ResultExporter
+from .model.solution import Solution
+from .model.result_exporter import ResultExporter, FIGURE_POLICIES
 from .model.execution_context import ExecutionContext
+from .model.result_cache import ResultCache
 
 import argparse
+import sys
+import numpy as np
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--instance", required=True, help="Instance name (located in the ./instances directory)")
     parser.add_argument("--out", required=True, help="Output directory")
     parser.add_argument("--first_improve", action="store_true", help="Enable first-improve strategy in local-search (default = best-improve)")
+    parser.add_argument("--batch_eval", action="store_true", help="Evaluate the insertion and replace neighborhoods in batch with numpy (default = disabled)")
+    parser.add_argument("--neighbors", type=int, default=0, help="Size of the nearest neighbor lists for the granular relocate, 2-opt and 3-opt neighborhoods. 0: full neighborhoods (default = 0)")
+    parser.add_argument("--dont_look_bits", action="store_true", help="Enable don't-look bits in the relocate and 2-opt neighborhoods (default = disabled)")
+    parser.add_argument("--insertion_cache", action="store_true", help="Keep the best insertion position of every unvisited vertex between iterations (default = disabled)")
+    parser.add_argument("--eval_threads", type=int, default=1, help="Threads evaluating the 3-opt and intensified replace neighborhoods with numpy, split by route ranges (default = 1: sequential)")
+    parser.add_argument("--lns", action="store_true", help="When the search stalls, rebuild a segment of the best route with the ilp solver (destroy and repair) and restart from it if it improved (default = disabled)")
+    parser.add_argument("--lns_segment", type=int, default=8, help="LNS: number of vertices removed from the route (default = 8)")
+    parser.add_argument("--lns_neighbors", type=int, default=5, help="LNS: nearest unvisited vertices of each vertex of the segment added to the subproblem (default = 5)")
+    parser.add_argument("--lns_time", type=float, default=1, help="LNS: time limit (seconds) of each subproblem (default = 1)")
     parser.add_argument("--intensification", action="store_true", help="Enable intensification (default = disabled)")
     parser.add_argument("--diversification", action="store_true", help="Enable diversification (default = disabled)")
     parser.add_argument("--max_time", type=int, default=60, help="Maximum runtime (seconds)")
     parser.add_argument("--target", type=int, default=99999999, help="Score target")
     parser.add_argument("--figure_export_option", type=int, default=0, help="0: don't display/save. 1: display figures in runtime. 2: save figures in filesystem")
     parser.add_argument("--export_figure_level", type=int, default=0, help="0: export only improve solutions. 1: display all solutions during the tabu search")
+    parser.add_argument("--figure_workers", type=int, default=1, help="Processes rendering the saved figures (--figure_export_option 2) in background. 0: render in the search (default = 1)")
+    parser.add_argument("--figure_queue", type=int, default=16, help="Maximum number of figures waiting to be rendered (default = 16)")
+    parser.add_argument("--figure_policy", choices=FIGURE_POLICIES, default="drop", help="When the figure queue is full: wait for a free slot (block) or discard the figure (drop) (default = drop)")
     parser.add_argument("--plot_score", action="store_true", help="Whether the vertices' scores should be plotted in the exported figures (default = true)")
     parser.add_argument("--config_name", required=True, help="Name to be used to save in the result files")
     parser.add_argument("--rng", type=int, default=0, help="Seed number for random generator")
+    parser.add_argument("--workers", type=int, default=1, help="Number of independent tabu searches run in parallel processes, with seeds derived from --rng (default = 1)")
+    parser.add_argument("--migration_interval", type=int, default=0, help="Island model: iterations between the exchanges of best solutions among the workers. 0: independent workers (default = 0)")
+    parser.add_argument("--topology", choices=TOPOLOGIES, default="ring", help="Island model: send the best solution to the next worker (ring) or to all the workers (broadcast) (default = ring)")
+    parser.add_argument("--float32", action="store_true", help="Store the distance matrix in single precision to halve its memory (default = float64)")
+    parser.add_argument("--cache_dir", help="Directory of the result cache, a run with the same instance, options and source code restores its csv files from it (default = disabled)")
+    parser.add_argument("--debug", action="store_true", help="Check the cached distance/score of the solution against a full recomputation after every move (slow)")
 
     args = parser.parse_args()
+    if args.lns and args.workers > 1:
+        parser.error("--lns is not supported with --workers > 1")
 
     instance = str(args.instance)
     out = str(args.out)
     first_improve = bool(args.first_improve)
     enable_intensification = bool(args.intensification)
+    batch_eval = bool(args.batch_eval)
+    neighbors = int(args.neighbors)
+    dont_look_bits = bool(args.dont_look_bits)
+    insertion_cache = bool(args.insertion_cache)
+    eval_threads = int(args.eval_threads)
     enable_diversification = bool(args.diversification)
+    lns = bool(args.lns)
+    lns_segment = int(args.lns_segment)
+    lns_neighbors = int(args.lns_neighbors)
+    lns_time = float(args.lns_time)
     max_time = int(args.max_time)
     target = int(args.target)
     figure_export_option = int(args.figure_export_option)
     export_figure_level = int(args.export_figure_level)
     plot_score = bool(args.plot_score)
+    figure_workers = int(args.figure_workers)
+    figure_queue = int(args.figure_queue)
+    figure_policy = str(args.figure_policy)
     config_name = str(args.config_name)
     rng = int(args.rng)
+    workers = int(args.workers)
+    migration_interval = int(args.migration_interval)
+    topology = str(args.topology)
+    float32 = bool(args.float32)
+    debug = bool(args.debug)
+    cache_dir = args.cache_dir
 
     print(f"Running tabu search with options:")
     print(f"Instance: {instance}")
@@ -41,22 +85,55 @@ if __name__ == "__main__":
     print(f"First improve: {first_improve}")
     print(f"Intensification: {enable_intensification}")
     print(f"Diversification: {enable_diversification}")
+    print(f"LNS: {lns} (segment: {lns_segment}, neighbors: {lns_neighbors}, time: {lns_time})")
+    print(f"Batch evaluation: {batch_eval}")
+    print(f"Neighbors: {neighbors}")
+    print(f"Don't-look bits: {dont_look_bits}")
+    print(f"Insertion cache: {insertion_cache}")
+    print(f"Evaluation threads: {eval_threads}")
     print(f"Tempo máximo: {max_time}")
     print(f"Target: {target}")
     print(f"Figure export option: {figure_export_option}")
     print(f"Export figure level: {export_figure_level}")
     print(f"Plot score: {plot_score}")
+    print(f"Figure workers: {figure_workers} (queue: {figure_queue}, policy: {figure_policy})")
     print(f"Config name: {config_name}")
     print(f"Seed RNG: {rng}")
+    print(f"Workers: {workers}")
+    print(f"Migration interval: {migration_interval}")
+    print(f"Topology: {topology}")
+    print(f"Float32: {float32}")
+    print(f"Debug: {debug}")
+    print(f"Cache dir: {cache_dir}")
 
-    op = OP.from_file(instance)
+    cache = ResultCache(cache_dir) if cache_dir else None
+    if cache is not None:
+        cache_key = cache.key(instance, {"solver": "tabu", **{k: v for k, v in vars(args).items() if k not in ("out", "cache_dir", "figure_workers", "figure_queue", "figure_policy")}})
+        if cache.restore(cache_key, out):
+            print(f"Results restored from the cache: {cache_key}")
+            sys.exit(0)
+
+    Solution.debug = debug
+
+    op = OP.from_file(instance, dtype=np.float32 if float32 else np.float64)
     context = ExecutionContext(op, config_name, out)
-    exporter = ResultExporter(op, out, figure_export_option, plot_score)
+    figure_kwargs = dict(figure_workers=figure_workers, figure_queue=figure_queue, figure_policy=figure_policy)
+    exporter = ResultExporter(op, out, figure_export_option, plot_score, **figure_kwargs)
 
-    ts = TabuSearch(op, context, exporter, ls_first_improve=first_improve, enable_diversification=enable_diversification, enable_intensification=enable_intensification, max_time_sec=max_time, target=target, export_fig_lvl=export_figure_level, rng=rng)
+    ts_kwargs = dict(ls_first_improve=first_improve, enable_diversification=enable_diversification, enable_intensification=enable_intensification, max_time_sec=max_time, target=target, export_fig_lvl=export_figure_level, batch_eval=batch_eval, neighbors=neighbors, dont_look_bits=dont_look_bits, insertion_cache=insertion_cache, eval_threads=eval_threads)
 
-    ts.solve()
+    if workers > 1:
+        solve_parallel(op, context, workers, figure_export_option, plot_score, figure_kwargs=figure_kwargs, rng=rng, migration_interval=migration_interval, topology=topology, **ts_kwargs)
+    else:
+        lns_solver = LNS(op, segment_size=lns_segment, neighbors=lns_neighbors, time_limit=lns_time, rng=rng) if lns else None
+        ts = TabuSearch(op, context, exporter, rng=rng, lns=lns_solver, **ts_kwargs)
+        ts.solve()
+    exporter.close()
 
     context.export_improves_csv()
     context.export_improve_scores_csv()
     context.export_best_sol_csv()
+    context.export_best_route_csv()
+
+    if cache is not None:
+        cache.store(cache_key, out)
@@ -0,0 +1,33 @@
+class DontLookBits:
+    """
+    Don't-look bits for the distance-improvement neighborhoods.
+    A vertex whose bit is set had no improving move in its last scan of the
+    neighborhood and is skipped until a move changes the arcs around it.
+    """
+    def __init__(self, n: int, neighborhoods: list[str]):
+        self.n = n
+        self.bits = {name: [False] * n for name in neighborhoods}
+
+    def skip_mask(self, neighborhood: str) -> list[bool]:
+        return self.bits[neighborhood]
+
+    def sleep(self, neighborhood: str, vertices: list[int], improving: set[int]):
+        """
+        Set the bits of the scanned vertices that have no improving move
+        """
+        bits = self.bits[neighborhood]
+        for v in vertices:
+            if v not in improving:
+                bits[v] = True
+
+    def wake(self, vertices: list[int]):
+        for bits in self.bits.values():
+            for v in vertices:
+                bits[v] = False
+
+    def reset(self):
+        for name in self.bits:
+            self.bits[name] = [False] * self.n
+
+    def __str__(self):
+        return f"DontLookBits sleeping: {({name: sum(bits) for name, bits in self.bits.items()})}"
@@ -1,60 +1,101 @@
 from ..model.op import OP
 from ..model.solution import Solution
-from .move.insertion_move import InsertionMove
-from .move.relocate_move import RelocateMove
-from .move.two_opt_move import TwoOptMove
-from .move.three_opt_move import ThreeOptMove
-from .move.replace_move import ReplaceMove
-from .move.move import Move
+from .insertion_cache import InsertionCache
 
 from typing import Generator
 
+import numpy as np
 import random
 
 class Evaluator:
-    def __init__(self, op: OP):
+    """
+    The *_candidates generators yield plain tuples with the constructor arguments of
+    the corresponding Move (InsertionMove, RelocateMove, ...), so that only the moves
+    selected by the search are instantiated.
+    """
+    def __init__(self, op: OP, neighbors: int=0, insertion_cache: bool=False):
         self.op = op
 
-    def insertion_candidates(self, sol: Solution) -> Generator[Move]:
-        cur_dist = self.total_dist(sol)
+        # granular mode: relocate, 2-opt and 3-opt only generate moves that create
+        # at least one arc between a vertex and one of its nearest neighbors
+        self.neighbors: list[list[int]] | None = None
+        if neighbors > 0:
+            self.neighbors = op.nearest_neighbors(neighbors).tolist()
+
+        # best insertion position of the unvisited vertices, kept up to date between the
+        # calls instead of scanning every route position again
+        self.insertion_cache: InsertionCache | None = None
+        if insertion_cache:
+            self.insertion_cache = InsertionCache(op.n, op.A_rows, op.scores.tolist(), self._calculate_delta_improve)
+
+    def insertion_candidates(self, sol: Solution) -> Generator[tuple[int, int, int, float, float]]:
+        if self.insertion_cache is not None:
+            yield from self._cached_insertion_candidates(sol)
+            return
+
+        cur_dist = sol.dist
+        vertices = sol.get_vertices()
 
         for cand in sol.get_remaining_vertices():
-            for prev in sol.get_vertices():
+            for prev in vertices:
                 if prev == sol.n - 1: #disconsider the last vertex
                     continue
                 delta_dist = self._evaluate_insertion_delta_dist(sol, cand, prev)
                 if cur_dist + delta_dist <= self.op.t_max:
                     delta_score = self._evaluate_insertion_delta_score(cand)
                     delta_improve = self._calculate_delta_improve(delta_score, delta_dist)
-                    yield InsertionMove(cand, prev, delta_score, delta_dist, delta_improve)
+                    yield (cand, prev, delta_score, delta_dist, delta_improve)
     
-    def relocate_candidates(self, sol: Solution) -> Generator[Move]:
-        cur_dist = self.total_dist(sol)
+    def relocate_candidates(self, sol: Solution, skip: list[bool] | None=None) -> Generator[tuple[int, int, float]]:
+        """
+        When given, the vertices with skip[cand] set are not relocated (don't-look bits)
+        """
+        if self.neighbors is not None:
+            yield from self._granular_relocate_candidates(sol, skip)
+            return
 
-        for cand in sol.get_vertices():
+        cur_dist = sol.dist
+        vertices = sol.get_vertices()
+
+        for cand in vertices:
             if cand == 0 or cand == sol.n - 1: #disconsider the first and end vertices
                 continue
-            for rel_pos in sol.get_vertices():
+            if skip is not None and skip[cand]:
+                continue
+            for rel_pos in vertices:
                 if rel_pos == cand or sol.next[rel_pos] == cand or rel_pos == sol.n - 1:
                     continue
                 delta_dist = self._evaluate_realocate_delta_dist(sol, cand, rel_pos)
                 if cur_dist + delta_dist <= self.op.t_max:
-                    yield RelocateMove(cand, rel_pos, delta_dist)
+                    yield (cand, rel_pos, delta_dist)
     
-    def twoOpt_candidates(self, sol: Solution) -> Generator[Move]:
-        cur_dist = self.total_dist(sol)
+    def twoOpt_candidates(self, sol: Solution, skip: list[bool] | None=None) -> Generator[tuple[int, int, float]]:
+        """
+        When given, the vertices with skip[v1] set are not used as v1 (don't-look bits)
+        """
+        if self.neighbors is not None:
+            yield from self._granular_twoOpt_candidates(sol, skip)
+            return
+
+        cur_dist = sol.dist
         vertices = sol.get_vertices()
 
         for i in range(len(vertices)):
             v1 = vertices[i]
+            if skip is not None and skip[v1]:
+                continue
             for j in range(i + 2, len(vertices) - 1):
                 v2 = vertices[j]
                 delta_dist = self._evaluate_twoOpt_delta_dist(sol, v1, v2)
                 if cur_dist + delta_dist <= self.op.t_max:
-                    yield TwoOptMove(v1, v2, delta_dist)
+                    yield (v1, v2, delta_dist)
     
-    def threeOpt_candidates(self, sol: Solution) -> Generator[Move]:
-        cur_dist = self.total_dist(sol)
+    def threeOpt_candidates(self, sol: Solution) -> Generator[tuple[int, int, int, bool, float]]:
+        if self.neighbors is not None:
+            yield from self._granular_threeOpt_candidates(sol)
+            return
+
+        cur_dist = sol.dist
         vertices = sol.get_vertices()
 
         for i in range(len(vertices)):
@@ -66,14 +107,93 @@ class Evaluator:
                     
                     delta_dist = self._evaluate_threeOpt_delta_dist(sol, v1, v2, v3)
                     if cur_dist + delta_dist <= self.op.t_max:
-                        yield ThreeOptMove(v1, v2, v3, segment_swap=False, delta_dist=delta_dist)
+                        yield (v1, v2, v3, False, delta_dist)
                     
                     delta_dist_case_2 = self._evaluate_threeOpt_with_segment_swap_delta_dist(sol, v1, v2, v3)
                     if cur_dist + delta_dist_case_2 <= self.op.t_max:
-                        yield ThreeOptMove(v1, v2, v3, segment_swap=True, delta_dist=delta_dist_case_2)
+                        yield (v1, v2, v3, True, delta_dist_case_2)
         
-    def replace_candidates(self, sol: Solution) -> Generator[Move]:
-        cur_dist = self.total_dist(sol)
+    def _granular_relocate_candidates(self, sol: Solution, skip: list[bool] | None) -> Generator[tuple[int, int, float]]:
+        """
+        Relocate cand right after or right before one of its nearest neighbors.
+        """
+        cur_dist = sol.dist
+
+        for cand in sol.get_vertices():
+            if cand == 0 or cand == sol.n - 1: #disconsider the first and end vertices
+                continue
+            if skip is not None and skip[cand]:
+                continue
+            seen = set()
+            for nb in self.neighbors[cand]:
+                if sol.pos[nb] is None:
+                    continue
+                for rel_pos in (nb, sol.prev[nb]):
+                    if rel_pos is None or rel_pos in seen or rel_pos == cand or sol.next[rel_pos] == cand or rel_pos == sol.n - 1:
+                        continue
+                    seen.add(rel_pos)
+                    delta_dist = self._evaluate_realocate_delta_dist(sol, cand, rel_pos)
+                    if cur_dist + delta_dist <= self.op.t_max:
+                        yield (cand, rel_pos, delta_dist)
+
+    def _granular_twoOpt_candidates(self, sol: Solution, skip: list[bool] | None) -> Generator[tuple[int, int, float]]:
+        """
+        2-opt moves whose new arc (v1, v2) or (next[v1], next[v2]) is a nearest neighbor arc.
+        """
+        cur_dist = sol.dist
+        vertices = sol.get_vertices()
+        last_pos = len(vertices) - 2 #v2 cannot be the last vertex
+
+        for i in range(len(vertices) - 1):
+            v1 = vertices[i]
+            if skip is not None and skip[v1]:
+                continue
+            next_v1 = sol.next[v1]
+            seen = set()
+            v2_cands = self.neighbors[v1] + [sol.prev[nb] for nb in self.neighbors[next_v1] if sol.pos[nb] is not None]
+            for v2 in v2_cands:
+                if v2 is None or v2 in seen or sol.pos[v2] is None or not i + 2 <= sol.pos[v2] <= last_pos:
+                    continue
+                seen.add(v2)
+                delta_dist = self._evaluate_twoOpt_delta_dist(sol, v1, v2)
+                if cur_dist + delta_dist <= self.op.t_max:
+                    yield (v1, v2, delta_dist)
+
+    def _granular_threeOpt_candidates(self, sol: Solution) -> Generator[tuple[int, int, int, bool, float]]:
+        """
+        3-opt moves whose first new arc, (v1, v2) without segment swap
+        or (v1, v3) with segment swap, is a nearest neighbor arc.
+        """
+        cur_dist = sol.dist
+        vertices = sol.get_vertices()
+        last_pos = len(vertices) - 2 #v3 cannot be the last vertex
+
+        for i in range(len(vertices)):
+            v1 = vertices[i]
+            for nb in self.neighbors[v1]:
+                j = sol.pos[nb]
+                if j is None or j < i + 2:
+                    continue
+
+                v2 = nb
+                for k in range(j + 2, last_pos + 1):
+                    v3 = vertices[k]
+                    delta_dist = self._evaluate_threeOpt_delta_dist(sol, v1, v2, v3)
+                    if cur_dist + delta_dist <= self.op.t_max:
+                        yield (v1, v2, v3, False, delta_dist)
+
+                if j > last_pos:
+                    continue
+
+                v3 = nb
+                for k in range(i + 2, j - 1):
+                    v2 = vertices[k]
+                    delta_dist = self._evaluate_threeOpt_with_segment_swap_delta_dist(sol, v1, v2, v3)
+                    if cur_dist + delta_dist <= self.op.t_max:
+                        yield (v1, v2, v3, True, delta_dist)
+
+    def replace_candidates(self, sol: Solution) -> Generator[tuple[int, int, int, int, float, float]]:
+        cur_dist = sol.dist
         vertices = sol.get_vertices()
         remaining_vertices = sol.get_remaining_vertices()
 
@@ -86,11 +206,189 @@ class Evaluator:
                     if cur_dist + delta_dist <= self.op.t_max:
                         delta_improve = self._calculate_delta_improve(delta_score, delta_dist)
                         insert_pos = sol.prev[out_cand]
-                        yield ReplaceMove(in_cand, insert_pos, out_cand, delta_score, delta_dist, delta_improve)
+                        yield (in_cand, insert_pos, out_cand, delta_score, delta_dist, delta_improve)
+
 
+    def insertion_batch(self, sol: Solution) -> tuple[np.ndarray, ...]:
+        """
+        Evaluate every insertion move (unvisited vertex x route position) at once.
 
-    def intensified_replace_candidates(self, sol: Solution):
-        cur_dist = self.total_dist(sol)
+        Returns the candidates (u,), the insert positions (k-1,), the delta scores (u,)
+        and the (u, k-1) matrices of delta distance, delta ratio and feasibility.
+        """
+        cands = np.array(sol.get_remaining_vertices(), dtype=np.intp)
+        route = np.array(sol.get_vertices(), dtype=np.intp)
+        prevs, nexts = route[:-1], route[1:] #disconsider the last vertex
+
+        dist_added_1 = self._gather(prevs, cands).T
+        dist_added_2 = self._gather(cands, nexts)
+        dist_removed = self._gather_arcs(prevs, nexts)[None, :]
+
+        delta_dist = dist_added_1 + dist_added_2 - dist_removed
+        delta_score = self.op.scores[cands]
+        delta_ratio = self._calculate_delta_improve_batch(delta_score[:, None], delta_dist)
+        feasible = sol.dist + delta_dist <= self.op.t_max
+
+        return cands, prevs, delta_score, delta_dist, delta_ratio, feasible
+
+    def replace_batch(self, sol: Solution) -> tuple[np.ndarray, ...]:
+        """
+        Evaluate every replace move (route vertex x unvisited vertex) at once.
+
+        Returns the out candidates (k-2,), their insert positions (k-2,), the in candidates (u,)
+        and the (k-2, u) matrices of delta score, delta distance, delta ratio and feasibility.
+        Moves with a negative delta score are reported as infeasible.
+        """
+        in_cands = np.array(sol.get_remaining_vertices(), dtype=np.intp)
+        route = np.array(sol.get_vertices(), dtype=np.intp)
+        prevs, out_cands, nexts = route[:-2], route[1:-1], route[2:]
+
+        dist_removed_1 = self._gather_arcs(prevs, out_cands)[:, None]
+        dist_removed_2 = self._gather_arcs(out_cands, nexts)[:, None]
+        dist_added_1 = self._gather(prevs, in_cands)
+        dist_added_2 = self._gather(in_cands, nexts).T
+
+        delta_dist = dist_added_1 + dist_added_2 - dist_removed_1 - dist_removed_2
+        delta_score = self.op.scores[in_cands][None, :] - self.op.scores[out_cands][:, None]
+        delta_ratio = self._calculate_delta_improve_batch(delta_score, delta_dist)
+        feasible = (delta_score >= 0) & (sol.dist + delta_dist <= self.op.t_max)
+
+        return out_cands, prevs, in_cands, delta_score, delta_dist, delta_ratio, feasible
+
+    def route_arrays(self, sol: Solution) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Route and next vertex of each route position (the last vertex is its own next)
+        """
+        route = np.array(sol.get_vertices(), dtype=np.intp)
+        nexts = np.append(route[1:], route[-1])
+        return route, nexts
+
+    def threeOpt_rows(self, sol: Solution, rows: range, route: np.ndarray, nexts: np.ndarray, first_improve: bool) -> tuple[tuple | None, tuple | None]:
+        """
+        Evaluate with numpy the 3-opt moves whose v1 is at the route indices in rows,
+        in the same order as threeOpt_candidates.
+
+        Returns the first improving candidate when first_improve is set (the best one is not
+        tracked, it can only be applied if improving), otherwise the best candidate (first one on ties).
+        """
+        cur_dist = sol.dist
+        L = len(route)
+        best = None
+        best_delta_dist = float("+inf")
+
+        for i in rows:
+            J = np.arange(i + 2, L - 3) #v2 indices, v3 cannot be after the second to last vertex
+            K = np.arange(i + 4, L - 1) #v3 indices
+            if len(J) == 0 or len(K) == 0:
+                continue
+
+            v1, next_v1 = route[i], nexts[i]
+            v2, next_v2 = route[J], nexts[J]
+            v3, next_v3 = route[K], nexts[K]
+
+            dist_removed_1 = self.op.A_rows[v1][next_v1]
+            dist_removed_2 = self._gather_arcs(v2, next_v2)[:, None]
+            dist_removed_3 = self._gather_arcs(v3, next_v3)[None, :]
+
+            # S_1 S_2(reverted) S_3(reverted) S_4
+            delta_dist = self._gather_arcs(v1, v2)[:, None] + self._gather_arcs(next_v1, v3)[None, :] + self._gather(next_v2, next_v3) \
+                - dist_removed_1 - dist_removed_2 - dist_removed_3
+            # S_1 S_3(reverted) S_2(reverted) S_4
+            delta_dist_case_2 = self._gather_arcs(v1, v3) + self._gather_arcs(next_v1, next_v3) - dist_removed_1 - dist_removed_3[0]
+
+            # (v2, v3, segment swap) in the order of the sequential scan
+            delta_dist = np.stack((delta_dist, np.broadcast_to(delta_dist_case_2, delta_dist.shape)), axis=-1)
+            valid = (K[None, :] >= J[:, None] + 2)[..., None] & (cur_dist + delta_dist <= self.op.t_max)
+
+            def candidate_at(idx: int) -> tuple:
+                j, k, swap = np.unravel_index(idx, delta_dist.shape)
+                return (int(v1), int(v2[j]), int(v3[k]), bool(swap), float(delta_dist[j, k, swap]))
+
+            if first_improve:
+                improving = valid & (delta_dist < 0.0)
+                idx = int(np.argmax(improving))
+                if improving.flat[idx]:
+                    return candidate_at(idx), best
+                continue
+
+            masked = np.where(valid, delta_dist, np.inf)
+            idx = int(np.argmin(masked))
+            if masked.flat[idx] < best_delta_dist:
+                best_delta_dist = masked.flat[idx]
+                best = candidate_at(idx)
+
+        return None, best
+
+    def intensified_replace_rows(self, sol: Solution, rows: range, route: np.ndarray, nexts: np.ndarray, first_improve: bool) -> tuple[tuple | None, ...]:
+        """
+        Evaluate with numpy the intensified replace moves whose out_cand is at the route
+        indices in rows, in the same order as intensified_replace_candidates.
+
+        Returns the first improving candidate when first_improve is set, otherwise the best
+        candidates of the three cases of the search (first one on ties): the best delta distance
+        without score change, the best delta score improving the distance and the best delta ratio.
+        """
+        cur_dist = sol.dist
+        remaining_vertices = np.array(sol.get_remaining_vertices(), dtype=np.intp)
+        best_dist = best_score = best_ratio = None
+
+        for i in rows:
+            out_cand = route[i]
+            prev_out, next_out = route[i - 1], nexts[i]
+
+            delta_score = self.op.scores[remaining_vertices] - self.op.scores[out_cand]
+            in_cands = remaining_vertices[delta_score >= 0]
+            delta_score = delta_score[delta_score >= 0][:, None]
+            if len(in_cands) == 0:
+                continue
+
+            # cannot insert after the end vertex, neither after the out_cand
+            insert_pos = np.delete(route[:-1], i)
+            next_insert = np.delete(nexts[:-1], i)
+
+            delta_dist = self.op.A_rows[prev_out][next_out] + self._gather(insert_pos, in_cands).T + self._gather(in_cands, next_insert) \
+                - self.op.A_rows[prev_out][out_cand] - self.op.A_rows[out_cand][next_out] - self._gather_arcs(insert_pos, next_insert)[None, :]
+            delta_ratio = self._calculate_delta_improve_batch(delta_score, delta_dist)
+            feasible = cur_dist + delta_dist <= self.op.t_max
+
+            same_score = feasible & (delta_score == 0)
+            improves_both = feasible & (delta_score > 0) & (delta_dist < 0.0)
+            improves_score = feasible & (delta_score > 0) & (delta_dist >= 0.0)
+
+            def candidate_at(idx: int) -> tuple:
+                u, p = np.unravel_index(idx, delta_dist.shape)
+                return (int(in_cands[u]), int(insert_pos[p]), int(out_cand), int(delta_score[u, 0]), float(delta_dist[u, p]), float(delta_ratio[u, p]))
+
+            if first_improve:
+                improving = (same_score & (delta_dist < 0.0)) | improves_both | (improves_score & (delta_ratio > 0.0))
+                idx = int(np.argmax(improving))
+                if improving.flat[idx]:
+                    return candidate_at(idx), best_dist, best_score, best_ratio
+                continue
+
+            masked = np.where(same_score, delta_dist, np.inf)
+            idx = int(np.argmin(masked))
+            if same_score.flat[idx] and (best_dist is None or masked.flat[idx] < best_dist[4]):
+                best_dist = candidate_at(idx)
+
+            masked = np.where(improves_both, np.broadcast_to(delta_score, delta_dist.shape), -1)
+            idx = int(np.argmax(masked))
+            if improves_both.flat[idx] and (best_score is None or masked.flat[idx] > best_score[3]):
+                best_score = candidate_at(idx)
+
+            masked = np.where(improves_score, delta_ratio, -np.inf)
+            idx = int(np.argmax(masked))
+            if improves_score.flat[idx] and (best_ratio is None or masked.flat[idx] > best_ratio[5]):
+                best_ratio = candidate_at(idx)
+
+        return None, best_dist, best_score, best_ratio
+
+    def intensified_replace_candidates(self, sol: Solution) -> Generator[tuple[int, int, int, int, float, float]]:
+        if self.insertion_cache is not None:
+            yield from self._cached_intensified_replace_candidates(sol)
+            return
+
+        cur_dist = sol.dist
         vertices = sol.get_vertices()
         remaining_vertices = sol.get_remaining_vertices()
 
@@ -108,7 +406,58 @@ class Evaluator:
                         delta_dist = self._evaluate_intensified_replace_delta_dist(sol, in_cand, out_cand, insert_pos)
                         if cur_dist + delta_dist <= self.op.t_max:
                             delta_improve = self._calculate_delta_improve(delta_score, delta_dist)
-                            yield ReplaceMove(in_cand, insert_pos, out_cand, delta_score, delta_dist, delta_improve)
+                            yield (in_cand, insert_pos, out_cand, delta_score, delta_dist, delta_improve)
+
+    def _cached_insertion_candidates(self, sol: Solution) -> Generator[tuple[int, int, int, float, float]]:
+        """
+        Only the best insertion position of each unvisited vertex
+        (the second best one if the best is infeasible).
+        """
+        cache = self.insertion_cache
+        cache.update(sol)
+        cur_dist = sol.dist
+
+        for cand in sol.get_remaining_vertices():
+            for entry in (cache.best[cand], cache.second[cand]):
+                if entry is None:
+                    continue
+                delta_ratio, delta_dist, prev, _ = entry
+                if cur_dist + delta_dist <= self.op.t_max:
+                    delta_score = self._evaluate_insertion_delta_score(cand)
+                    yield (cand, prev, delta_score, delta_dist, delta_ratio)
+                    break
+
+    def _cached_intensified_replace_candidates(self, sol: Solution) -> Generator[tuple[int, int, int, int, float, float]]:
+        """
+        For each (out, in) pair, in_cand is only inserted in its best position of the path.
+        The arc (out_cand, next[out_cand]) disappears with out_cand, then the second best
+        position is used when it is the best one.
+        """
+        cache = self.insertion_cache
+        cache.update(sol)
+        cur_dist = sol.dist
+        vertices = sol.get_vertices()
+        remaining_vertices = sol.get_remaining_vertices()
+
+        for i in range(1, len(vertices) - 1):
+            out_cand = vertices[i]
+            prev_out = sol.prev[out_cand]
+            next_out = sol.next[out_cand]
+            dist_removed = self.op.A_rows[prev_out][next_out] - self.op.A_rows[prev_out][out_cand] - self.op.A_rows[out_cand][next_out]
+
+            for in_cand in remaining_vertices:
+                delta_score = self._evaluate_replace_delta_score(in_cand, out_cand)
+                if delta_score >= 0.0:
+                    entry = cache.best[in_cand]
+                    if entry is not None and entry[2] == out_cand:
+                        entry = cache.second[in_cand]
+                    if entry is None:
+                        continue
+
+                    delta_dist = dist_removed + entry[1]
+                    if cur_dist + delta_dist <= self.op.t_max:
+                        delta_improve = self._calculate_delta_improve(delta_score, delta_dist)
+                        yield (in_cand, entry[2], out_cand, delta_score, delta_dist, delta_improve)
 
     def diversify_vertices(self, sol: Solution) -> Solution:
         vertices = sol.get_vertices()
@@ -150,11 +499,11 @@ class Evaluator:
         prev_out = sol.prev[out_cand]
         next_out = sol.next[out_cand]
 
-        dist_removed_1 = self.op.A[prev_out][out_cand]
-        dist_removed_2 = self.op.A[out_cand][next_out]
+        dist_removed_1 = self.op.A_rows[prev_out][out_cand]
+        dist_removed_2 = self.op.A_rows[out_cand][next_out]
 
-        dist_added_1 = self.op.A[prev_out][in_cand]
-        dist_added_2 = self.op.A[in_cand][next_out]
+        dist_added_1 = self.op.A_rows[prev_out][in_cand]
+        dist_added_2 = self.op.A_rows[in_cand][next_out]
 
         return dist_added_1 + dist_added_2 - dist_removed_1 - dist_removed_2
 
@@ -163,25 +512,25 @@ class Evaluator:
         prev_out = sol.prev[out_cand]
         next_out = sol.next[out_cand]
         
-        dist_removed_1 = self.op.A[prev_out][out_cand]
-        dist_removed_2 = self.op.A[out_cand][next_out]
-        dist_added_1 = self.op.A[prev_out][next_out]
+        dist_removed_1 = self.op.A_rows[prev_out][out_cand]
+        dist_removed_2 = self.op.A_rows[out_cand][next_out]
+        dist_added_1 = self.op.A_rows[prev_out][next_out]
 
         #for the in vertex
         next_insert = sol.next[insert_pos]
 
-        dist_removed_3 = self.op.A[insert_pos][next_insert]
-        dist_added_2 = self.op.A[insert_pos][in_cand]
-        dist_added_3 = self.op.A[in_cand][next_insert]
+        dist_removed_3 = self.op.A_rows[insert_pos][next_insert]
+        dist_added_2 = self.op.A_rows[insert_pos][in_cand]
+        dist_added_3 = self.op.A_rows[in_cand][next_insert]
        
         return dist_added_1 + dist_added_2 + dist_added_3 - dist_removed_1 - dist_removed_2 - dist_removed_3
 
     def _evaluate_insertion_delta_dist(self, sol: Solution, cand: int, insert_pos: int) -> float:
         next = sol.next[insert_pos]
 
-        dist_removed = self.op.A[insert_pos][next]
-        dist_added_1 = self.op.A[insert_pos][cand]
-        dist_added_2 = self.op.A[cand][next]
+        dist_removed = self.op.A_rows[insert_pos][next]
+        dist_added_1 = self.op.A_rows[insert_pos][cand]
+        dist_added_2 = self.op.A_rows[cand][next]
         
         return dist_added_1 + dist_added_2 - dist_removed
     
@@ -200,18 +549,33 @@ class Evaluator:
         #return delta_score
         #return delta_score + 1.5*(-delta_dist)
                 
+    def _calculate_delta_improve_batch(self, delta_score: np.ndarray, delta_dist: np.ndarray) -> np.ndarray:
+        big_const = 10000.0 #non-infinite big constant
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(delta_dist == 0.0, delta_score * big_const, delta_score / delta_dist)
+
+    def _gather(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """
+        Distances between every row and column vertex, always in double precision
+        so that the batch deltas match the scalar ones.
+        """
+        return self.op.A[np.ix_(rows, cols)].astype(np.float64, copy=False)
+
+    def _gather_arcs(self, tails: np.ndarray, heads: np.ndarray) -> np.ndarray:
+        return self.op.A[tails, heads].astype(np.float64, copy=False)
+
     def _evaluate_realocate_delta_dist(self, sol: Solution, cand: int, rel_pos: int) -> float:
         prev_of_cand = sol.prev[cand]
         next_of_cand = sol.next[cand]
         next_of_rel_pos = sol.next[rel_pos]
 
-        dist_added_1 = self.op.A[prev_of_cand][next_of_cand]
-        dist_added_2 = self.op.A[rel_pos][cand]
-        dist_added_3 = self.op.A[cand][next_of_rel_pos]
+        dist_added_1 = self.op.A_rows[prev_of_cand][next_of_cand]
+        dist_added_2 = self.op.A_rows[rel_pos][cand]
+        dist_added_3 = self.op.A_rows[cand][next_of_rel_pos]
 
-        dist_removed_1 = self.op.A[prev_of_cand][cand]
-        dist_removed_2 = self.op.A[cand][next_of_cand]
-        dist_removed_3 = self.op.A[rel_pos][next_of_rel_pos]
+        dist_removed_1 = self.op.A_rows[prev_of_cand][cand]
+        dist_removed_2 = self.op.A_rows[cand][next_of_cand]
+        dist_removed_3 = self.op.A_rows[rel_pos][next_of_rel_pos]
 
         return dist_added_1 + dist_added_2 + dist_added_3 - dist_removed_1 - dist_removed_2 - dist_removed_3
         
@@ -219,11 +583,11 @@ class Evaluator:
         next_v1 = sol.next[v1]
         next_v2 = sol.next[v2]
 
-        dist_removed_1 = self.op.A[v1][next_v1]
-        dist_removed_2 = self.op.A[v2][next_v2]
+        dist_removed_1 = self.op.A_rows[v1][next_v1]
+        dist_removed_2 = self.op.A_rows[v2][next_v2]
 
-        dist_added_1 = self.op.A[v1][v2]
-        dist_added_2 = self.op.A[next_v1][next_v2]
+        dist_added_1 = self.op.A_rows[v1][v2]
+        dist_added_2 = self.op.A_rows[next_v1][next_v2]
 
         return dist_added_1 + dist_added_2 - dist_removed_1 - dist_removed_2
 
@@ -235,13 +599,13 @@ class Evaluator:
         next_v2 = sol.next[v2]
         next_v3 = sol.next[v3]
 
-        dist_removed_1 = self.op.A[v1][next_v1]
-        dist_removed_2 = self.op.A[v2][next_v2]
-        dist_removed_3 = self.op.A[v3][next_v3]
+        dist_removed_1 = self.op.A_rows[v1][next_v1]
+        dist_removed_2 = self.op.A_rows[v2][next_v2]
+        dist_removed_3 = self.op.A_rows[v3][next_v3]
 
-        dist_added_1 = self.op.A[v1][v2]
-        dist_added_2 = self.op.A[next_v1][v3]
-        dist_added_3 = self.op.A[next_v2][next_v3]
+        dist_added_1 = self.op.A_rows[v1][v2]
+        dist_added_2 = self.op.A_rows[next_v1][v3]
+        dist_added_3 = self.op.A_rows[next_v2][next_v3]
 
         return dist_added_1 + dist_added_2 + dist_added_3 - dist_removed_1 - dist_removed_2 - dist_removed_3
 
@@ -252,26 +616,19 @@ class Evaluator:
         next_v1 = sol.next[v1]
         next_v3 = sol.next[v3]
 
-        dist_removed_1 = self.op.A[v1][next_v1]
-        dist_removed_2 = self.op.A[v3][next_v3]
+        dist_removed_1 = self.op.A_rows[v1][next_v1]
+        dist_removed_2 = self.op.A_rows[v3][next_v3]
 
-        dist_added_1 = self.op.A[v1][v3]
-        dist_added_2 = self.op.A[next_v1][next_v3]
+        dist_added_1 = self.op.A_rows[v1][v3]
+        dist_added_2 = self.op.A_rows[next_v1][next_v3]
 
         return dist_added_1 + dist_added_2 - dist_removed_1 - dist_removed_2
 
     def total_dist(self, sol: Solution) -> float:
-        total_dist = 0.0
-        for u, v in enumerate(sol.next):
-            if v is not None:
-                total_dist += self.op.A[u][v]
-        return total_dist
+        return sol.dist
 
     def total_score(self, sol: Solution) -> float:
-        total_score = 0
-        for v in sol.get_vertices():
-            total_score += self.op.V[v].score
-        return total_score
+        return sol.score
     
     def is_feasible(self, sol: Solution) -> bool:
         return self.total_dist(sol) <= self.op.t_max
\ No newline at end of file
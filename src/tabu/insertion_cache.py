@@ -0,0 +1,143 @@
+from ..model.solution import Solution
+
+from typing import Callable
+
+# (delta ratio, delta distance, prev, next): insertion of a vertex in the arc (prev, next)
+Entry = tuple[float, float, int, int]
+
+class InsertionCache:
+    """
+    Best and second best insertion position (by delta ratio) of every unvisited vertex.
+
+    The cache keeps a snapshot of sol.next and is synchronized lazily by update():
+    only the vertices whose best or second best arc was removed are evaluated from
+    scratch, the others are only evaluated on the new arcs of the path.
+    The changed arcs are found from the vertices recorded by the mutations of the solution
+    (sol.changed), the whole snapshot is compared only when the solution object is replaced.
+    """
+    def __init__(self, n: int, A: list, scores: list[int], ratio: Callable[[int, float], float]):
+        self.n = n
+        self.A = A
+        self.scores = scores
+        self.ratio = ratio
+
+        self.next: list[int | None] | None = None #snapshot of sol.next at the last update
+        self.sol: Solution | None = None #solution of the snapshot
+        self.best: dict[int, Entry | None] = {}
+        self.second: dict[int, Entry | None] = {}
+
+    def update(self, sol: Solution):
+        old_next, new_next = self.next, sol.next
+        if old_next is None:
+            self._rebuild(sol)
+            return
+
+        if sol is self.sol and sol.changed is not None:
+            changed = [u for u in sorted(sol.changed) if old_next[u] != new_next[u]]
+        else: #e.g. a copy of the best solution
+            changed = [u for u in range(self.n) if old_next[u] != new_next[u]]
+
+        if not changed:
+            self._track(sol)
+            return
+
+        removed = {(u, old_next[u]) for u in changed if old_next[u] is not None}
+        added = [(u, new_next[u]) for u in changed if new_next[u] is not None]
+
+        # a reversed arc (v, u) has the same insertion cost as (u, v), the entries only need to be renamed
+        reversed_arcs = {(v, u): (u, v) for u, v in added if (v, u) in removed}
+        new_arcs = [(u, v) for u, v in added if (v, u) not in removed]
+
+        if len(new_arcs) * 2 >= len(sol.route):
+            self._rebuild(sol)
+            return
+
+        # the vertices inserted in the path have a new next
+        for u in changed:
+            if new_next[u] is not None:
+                self.best.pop(u, None)
+                self.second.pop(u, None)
+
+        for cand in sol.unvisited:
+            best = self._rename(self.best.get(cand), removed, reversed_arcs)
+            second = self._rename(self.second.get(cand), removed, reversed_arcs)
+
+            if cand not in self.best or best is False or second is False:
+                self._evaluate(sol, cand)
+                continue
+
+            score = self.scores[cand]
+            for u, v in new_arcs:
+                best, second = self._push(sol, best, second, self._entry(cand, score, u, v))
+            self.best[cand] = best
+            self.second[cand] = second
+
+        for u in changed:
+            old_next[u] = new_next[u]
+        self._track(sol)
+
+    def _rebuild(self, sol: Solution):
+        self.best.clear()
+        self.second.clear()
+        for cand in sol.unvisited:
+            self._evaluate(sol, cand)
+        self.next = sol.next[:]
+        self._track(sol)
+
+    def _track(self, sol: Solution):
+        """
+        Record the changes of sol from now on
+        """
+        self.sol = sol
+        sol.changed = set()
+
+    def _evaluate(self, sol: Solution, cand: int):
+        """
+        Evaluate every insertion position of cand, ties are broken by the earliest position
+        """
+        best = second = None
+        score = self.scores[cand]
+        last = self.n - 1
+
+        for prev in sol.route:
+            if prev == last: #disconsider the last vertex
+                continue
+            entry = self._entry(cand, score, prev, sol.next[prev])
+            if best is None or entry[0] > best[0]:
+                best, second = entry, best
+            elif second is None or entry[0] > second[0]:
+                second = entry
+
+        self.best[cand] = best
+        self.second[cand] = second
+
+    def _entry(self, cand: int, score: int, prev: int, next: int) -> Entry:
+        A = self.A
+        delta_dist = A[prev][cand] + A[cand][next] - A[prev][next]
+        return (self.ratio(score, delta_dist), delta_dist, prev, next)
+
+    def _push(self, sol: Solution, best: Entry | None, second: Entry | None, entry: Entry) -> tuple[Entry | None, Entry | None]:
+        if self._is_better(sol, entry, best):
+            return entry, best
+        if self._is_better(sol, entry, second):
+            return best, entry
+        return best, second
+
+    def _is_better(self, sol: Solution, entry: Entry, other: Entry | None) -> bool:
+        if other is None or entry[0] > other[0]:
+            return True
+        return entry[0] == other[0] and sol.pos[entry[2]] < sol.pos[other[2]]
+
+    def _rename(self, entry: Entry | None, removed: set[tuple[int, int]], reversed_arcs: dict[tuple[int, int], tuple[int, int]]) -> Entry | None | bool:
+        """
+        Returns the entry in the current path, or False when its arc was removed
+        """
+        if entry is None:
+            return None
+        arc = (entry[2], entry[3])
+        if arc not in removed:
+            return entry
+        if arc in reversed_arcs:
+            u, v = reversed_arcs[arc]
+            return (entry[0], entry[1], u, v)
+        return False
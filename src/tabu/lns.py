@@ -0,0 +1,75 @@
+from ..model.op import OP
+from ..model.solution import Solution
+from ..model.execution_context import ExecutionContext
+from ..model.result_exporter import ResultExporter
+from ..ilp.solver import ILPSolver
+
+from pathlib import Path
+
+import random
+
+class LNS:
+    """
+    Destroy and repair of the best solution with ilp subproblems.
+
+    A random segment of the route is removed (destroy), and the path between the ends of the
+    segment is rebuilt by the ilp solver (repair) over the vertices of the segment and the
+    unvisited vertices near them, with the budget left by the rest of the route, which is fixed.
+    The current segment is the MIP start, so the repaired route is never worse.
+    """
+    def __init__(self, op: OP, segment_size: int=8, neighbors: int=5, time_limit: float=1, rng: int=0):
+        self.op = op
+        self.segment_size = segment_size
+        self.neighbors = op.nearest_neighbors(neighbors) if neighbors > 0 else None
+        self.time_limit = time_limit
+        self.random = random.Random(rng)
+
+    def improve(self, sol: Solution, out: str, max_time_sec: float | None=None) -> Solution | None:
+        """
+        Returns the repaired solution, or None if the subproblem did not improve it.
+        The logs of the subproblems are saved in <out>/lns
+        """
+        route = sol.get_vertices()
+        size = min(self.segment_size, len(route) - 2) #removed vertices
+        p = self.random.randrange(len(route) - size - 1)
+        a, b = route[p], route[p + size + 1]
+        segment = route[p + 1:p + size + 1]
+
+        free = list(segment)
+        if self.neighbors is not None:
+            seen = set(free)
+            for v in [a] + segment + [b]:
+                for u in self.neighbors[v].tolist():
+                    if u in sol.unvisited and u not in seen:
+                        seen.add(u)
+                        free.append(u)
+
+        A = self.op.A_rows
+        segment_dist = sum(A[u][v] for u, v in zip(route[p:p + size + 1], route[p + 1:p + size + 2]))
+        sub = self.op.subproblem([a] + free + [b], self.op.t_max - (sol.dist - segment_dist))
+
+        time_limit = self.time_limit if max_time_sec is None else min(self.time_limit, max_time_sec)
+        if time_limit <= 0:
+            return None
+
+        out = f"{out}/lns"
+        Path(out).mkdir(parents=True, exist_ok=True)
+        context = ExecutionContext(sub, "lns", out, verbose=False)
+        exporter = ResultExporter(sub, out, figure_export_option=0)
+
+        initial_sol = Solution.from_route(sub, list(range(len(segment) + 1)) + [sub.n - 1])
+        solver = ILPSolver(sub, context, exporter, time_limit, threads=1, formulation="sec", initial_sol=initial_sol, verbose=False)
+        solver.solve()
+
+        if context.best_sol is None:
+            return None
+
+        vertices = [a] + free + [b]
+        new_route = route[:p] + [vertices[v] for v in context.best_sol.get_vertices()] + route[p + size + 2:]
+        new_sol = Solution.from_route(self.op, new_route)
+
+        if new_sol.dist > self.op.t_max:
+            return None
+        if new_sol.score > sol.score or (new_sol.score == sol.score and new_sol.dist < sol.dist - 1e-9):
+            return new_sol
+        return None
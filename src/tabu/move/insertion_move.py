@@ -2,6 +2,8 @@ from ...model.solution import Solution
 from .move import Move
 
 class InsertionMove(Move):
+    __slots__ = ("cand", "insert_pos", "_delta_score", "delta_dist", "_delta_ratio")
+
     def __init__(self, cand: int, insert_pos: int, _delta_score: int, delta_dist: float, _delta_ratio: float):
         self.cand = cand
         self.insert_pos = insert_pos
@@ -22,15 +24,14 @@ class InsertionMove(Move):
     def delta_distance(self) -> float:
         return self.delta_dist
     
-    def tabu_add_key(self) -> list[str]:
-        return [
-            str(self.cand)
-        ]
+    def touched_vertices(self, sol: Solution) -> list[int]:
+        return [self.insert_pos, self.cand, sol.next[self.insert_pos]]
+
+    def tabu_add_key(self) -> tuple[int, ...]:
+        return (self.cand,)
     
-    def tabu_check_key(self) -> list[str]:
-        return [
-            str(self.cand)
-        ]
+    def tabu_check_key(self) -> tuple[int, ...]:
+        return (self.cand,)
 
     def __str__(self):
             return (f"InsertionMove(cand={self.cand}, "
@@ -5,6 +5,7 @@ class Move(ABC):
     """
     Abstract base class representing a move applied to a solution.
     """
+    __slots__ = ()
 
     @abstractmethod
     def apply_move(self, sol: Solution) -> Solution:
@@ -64,9 +65,17 @@ class Move(ABC):
         pass
 
     @abstractmethod
-    def tabu_add_key(self) -> list[str]:
+    def touched_vertices(self, sol: Solution) -> list[int]:
         """
-        Returns the key (or signature) that should be added to the tabu list
+        Returns the endpoints of the arcs that this move changes in the solution.
+        Must be called before the move is applied.
+        """
+        pass
+
+    @abstractmethod
+    def tabu_add_key(self) -> tuple[int, ...]:
+        """
+        Returns the vertices that should be added to the tabu list
         after this move is applied.
 
         Typically represents the reverse or forbidden move that prevents
@@ -75,9 +84,9 @@ class Move(ABC):
         pass
 
     @abstractmethod
-    def tabu_check_key(self) -> list[str]:
+    def tabu_check_key(self) -> tuple[int, ...]:
         """
-        Returns the key used to check if this move is currently tabu.
+        Returns the vertices used to check if this move is currently tabu.
         """
         pass
 
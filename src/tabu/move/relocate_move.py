@@ -1,6 +1,9 @@
 from ...model.solution import Solution
+from .move import Move
+
+class RelocateMove(Move):
+    __slots__ = ("cand", "rel_pos", "delta_dist")
 
-class RelocateMove:
     def __init__(self, cand: int, rel_pos: int, delta_dist: float):
         self.cand = cand
         self.rel_pos = rel_pos
@@ -19,15 +22,14 @@ class RelocateMove:
     def delta_distance(self) -> float:
         return self.delta_dist
     
-    def tabu_add_key(self) -> list[str]:
-        return [
-            str(self.cand)
-        ]
+    def touched_vertices(self, sol: Solution) -> list[int]:
+        return [sol.prev[self.cand], self.cand, sol.next[self.cand], self.rel_pos, sol.next[self.rel_pos]]
+
+    def tabu_add_key(self) -> tuple[int, ...]:
+        return (self.cand,)
     
-    def tabu_check_key(self) -> list[str]:
-        return [
-            str(self.cand)
-        ]
+    def tabu_check_key(self) -> tuple[int, ...]:
+        return (self.cand,)
 
     def __str__(self):
         return (f"RelocateMove(cand={self.cand}, "
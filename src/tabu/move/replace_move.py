@@ -2,6 +2,8 @@ from ...model.solution import Solution
 from .move import Move
 
 class ReplaceMove(Move):
+    __slots__ = ("in_cand", "insert_pos", "out_cand", "_delta_score", "delta_dist", "_delta_ratio")
+
     def __init__(self, in_cand: int, insert_pos: int, out_cand: int, _delta_score: int, delta_dist: float, _delta_ratio: float):
         self.in_cand = in_cand
         self.insert_pos = insert_pos
@@ -23,15 +25,17 @@ class ReplaceMove(Move):
     def delta_distance(self) -> float:
         return self.delta_dist
     
-    def tabu_add_key(self) -> list[str]:
+    def touched_vertices(self, sol: Solution) -> list[int]:
         return [
-            str(self.out_cand), str(self.in_cand)
+            sol.prev[self.out_cand], self.out_cand, sol.next[self.out_cand],
+            self.insert_pos, sol.next[self.insert_pos], self.in_cand
         ]
+
+    def tabu_add_key(self) -> tuple[int, ...]:
+        return (self.out_cand, self.in_cand)
     
-    def tabu_check_key(self) -> list[str]:
-        return [
-            str(self.out_cand), str(self.in_cand)
-        ]
+    def tabu_check_key(self) -> tuple[int, ...]:
+        return (self.out_cand, self.in_cand)
 
     def __str__(self):
             return (f"ReplaceMove(in_cand={self.in_cand}, "
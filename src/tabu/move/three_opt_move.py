@@ -1,6 +1,9 @@
 from ...model.solution import Solution
+from .move import Move
+
+class ThreeOptMove(Move):
+    __slots__ = ("v1", "v2", "v3", "segment_swap", "delta_dist")
 
-class ThreeOptMove:
     def __init__(self, v1: int, v2: int, v3: int, segment_swap: bool, delta_dist: float):
         self.v1 = v1
         self.v2 = v2
@@ -25,15 +28,16 @@ class ThreeOptMove:
     def delta_distance(self) -> float:
         return self.delta_dist
     
-    def tabu_add_key(self) -> list[str]:
+    def touched_vertices(self, sol: Solution) -> list[int]:
         return [
-            str(self.v1), str(self.v2), str(self.v3)
+            self.v1, sol.next[self.v1], self.v2, sol.next[self.v2], self.v3, sol.next[self.v3]
         ]
+
+    def tabu_add_key(self) -> tuple[int, ...]:
+        return (self.v1, self.v2, self.v3)
     
-    def tabu_check_key(self) -> list[str]:
-        return [
-            str(self.v1), str(self.v2), str(self.v3)
-        ]
+    def tabu_check_key(self) -> tuple[int, ...]:
+        return (self.v1, self.v2, self.v3)
 
     def __str__(self):
         return (
@@ -1,6 +1,9 @@
 from ...model.solution import Solution
+from .move import Move
+
+class TwoOptMove(Move):
+    __slots__ = ("v1", "v2", "delta_dist")
 
-class TwoOptMove:
     def __init__(self, v1: int, v2: int, delta_dist: float):
         self.v1 = v1
         self.v2 = v2
@@ -19,15 +22,14 @@ class TwoOptMove:
     def delta_distance(self) -> float:
         return self.delta_dist
     
-    def tabu_add_key(self) -> list[str]:
-        return [
-            str(self.v1), str(self.v2)
-        ]
+    def touched_vertices(self, sol: Solution) -> list[int]:
+        return [self.v1, sol.next[self.v1], self.v2, sol.next[self.v2]]
+
+    def tabu_add_key(self) -> tuple[int, ...]:
+        return (self.v1, self.v2)
     
-    def tabu_check_key(self) -> list[str]:
-        return [
-            str(self.v1), str(self.v2)
-        ]
+    def tabu_check_key(self) -> tuple[int, ...]:
+        return (self.v1, self.v2)
 
     def __str__(self):
         return (
@@ -0,0 +1,177 @@
+from ..model.op import OP
+from ..model.solution import Solution
+from ..model.execution_context import ExecutionContext
+from ..model.result_exporter import ResultExporter
+from .tabu_search import TabuSearch
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import multiprocessing as mp
+import numpy as np
+import queue
+import time
+
+TOPOLOGIES = ["ring", "broadcast"]
+
+# shared state of the worker processes, set by _init_worker
+_shared_score = None
+_stop_event = None
+_inboxes = None
+
+def _init_worker(shared_score, stop_event, inboxes):
+    global _shared_score, _stop_event, _inboxes
+    _shared_score = shared_score
+    _stop_event = stop_event
+    _inboxes = inboxes
+
+class Island:
+    """
+    Migration of the best solutions between the islands (workers) of a parallel run.
+    Every `interval` iterations the island sends its best solution, if it changed since the
+    last migration, to the next island (ring) or to all the other islands (broadcast).
+    """
+    def __init__(self, index: int, inboxes: list, interval: int, topology: str):
+        self.index = index
+        self.inboxes = inboxes
+        self.interval = interval
+        self.topology = topology
+        self.last_sent: tuple[int, float] | None = None
+
+        for inbox in inboxes:
+            # the workers must not block at exit on the migrants that were never received
+            inbox.cancel_join_thread()
+
+    def targets(self) -> list[int]:
+        k = len(self.inboxes)
+        if self.topology == "ring":
+            return [(self.index + 1) % k]
+        return [i for i in range(k) if i != self.index]
+
+    def send(self, itr: int, best_sol: Solution):
+        if itr == 0 or itr % self.interval != 0 or self.last_sent == (best_sol.score, best_sol.dist):
+            return
+
+        self.last_sent = (best_sol.score, best_sol.dist)
+        msg = (self.index, best_sol.score, best_sol.dist, best_sol.next)
+        for i in self.targets():
+            self.inboxes[i].put(msg)
+
+    def receive(self, op: OP) -> Solution | None:
+        """
+        Best of the solutions received since the last call (higher score, then lower distance)
+        """
+        best = None
+        while True:
+            try:
+                msg = self.inboxes[self.index].get_nowait()
+            except queue.Empty:
+                break
+            if best is None or (msg[1], -msg[2]) > (best[1], -best[2]):
+                best = msg
+
+        return None if best is None else Solution.from_next(op, best[3])
+
+def _run_worker(op: OP, out: str, config_name: str, figure_export_option: int, plot_score: bool, start: float, seed: int, ts_kwargs: dict, island: tuple[int, int, str] | None=None, figure_kwargs: dict | None=None) -> tuple[list, list, list[int | None] | None, float | None, float]:
+    Path(out).mkdir(parents=True, exist_ok=True)
+
+    context = ExecutionContext(op, config_name, out, verbose=False, shared_score=_shared_score, stop_event=_stop_event)
+    exporter = ResultExporter(op, out, figure_export_option, plot_score, **(figure_kwargs or {}))
+
+    migration = None
+    if island is not None:
+        index, interval, topology = island
+        migration = Island(index, _inboxes, interval, topology)
+
+    ts = TabuSearch(op, context, exporter, rng=seed, migration=migration, **ts_kwargs)
+    try:
+        ts.solve(start)
+    finally:
+        context.request_stop()
+        exporter.close()
+
+    # trace of the worker
+    context.export_improves_csv()
+    context.export_improve_scores_csv()
+    context.export_best_sol_csv()
+    context.export_best_route_csv()
+
+    # only the next list of the best solution is sent back to the main process
+    best_next = None if context.best_sol is None else context.best_sol.next
+    return context.improves, context.improves_score, best_next, context.best_time, context.cpu_time()
+
+def derive_seeds(rng: int, workers: int) -> list[int]:
+    """
+    Independent seeds for the workers, derived from the seed of the run
+    """
+    return [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(rng).spawn(workers)]
+
+def solve_parallel(op: OP, context: ExecutionContext, workers: int, figure_export_option: int, plot_score: bool, figure_kwargs: dict | None=None, rng: int=0, migration_interval: int=0, topology: str="ring", **ts_kwargs):
+    """
+    Multi-start tabu search: runs one TabuSearch per worker process with derived seeds.
+
+    The workers share the best score (to stop at the target) and a stop event set by the
+    first worker to finish. With migration_interval > 0 the workers are islands that exchange
+    their best solutions (see Island), and a stalled island restarts from a migrant instead of
+    diversifying. Each worker writes its logs, figures and traces in <out>/worker_<i>,
+    and the improvements of all the workers are merged in the context of the run.
+    """
+    mp_context = mp.get_context()
+    shared_score = mp_context.Value("q", 0)
+    stop_event = mp_context.Event()
+    inboxes = [mp_context.Queue() for _ in range(workers)] if migration_interval > 0 else None
+
+    # the workers attach to the instance data instead of receiving a copy of it
+    shared_op = op.share()
+
+    seeds = derive_seeds(rng, workers)
+    start = time.time()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_worker, initargs=(shared_score, stop_event, inboxes)) as pool:
+            futures = [
+                pool.submit(
+                    _run_worker, shared_op, f"{context.out_relative_path}/worker_{i}", context.config_name, figure_export_option, plot_score, start, seed, ts_kwargs,
+                    island=(i, migration_interval, topology) if inboxes is not None else None, figure_kwargs=figure_kwargs
+                )
+                for i, seed in enumerate(seeds)
+            ]
+            results = []
+            for future in futures:
+                improves, improves_score, best_next, best_time, cpu_time = future.result()
+                results.append((improves, improves_score, None if best_next is None else Solution.from_next(op, best_next), best_time))
+                context.add_cpu_time(cpu_time)
+    finally:
+        shared_op.unlink()
+
+    for i, (_, _, best_sol, best_time) in enumerate(results):
+        if best_sol is not None:
+            context.log(f"[parallel] worker {i} (seed {seeds[i]}): score={best_sol.score}, dist={best_sol.dist}, time={best_time:.2f}", save=True)
+
+    _merge_results(context, results)
+
+def _merge_results(context: ExecutionContext, results: list[tuple[list, list, Solution | None, float | None]]):
+    """
+    Merge the improvements of the workers in time order, keeping only the ones
+    that improve the best solution found so far by any worker
+    """
+    rows = sorted((row for improves, _, _, _ in results for row in improves), key=lambda row: float(row[4]))
+
+    best = None
+    for row in rows:
+        score, dist = row[2], float(row[3])
+        if best is None or score > best[0] or (score == best[0] and dist < best[1]):
+            context.improves.append(row)
+            if best is None or score > best[0]:
+                context.improves_score.append(row)
+            best = (score, dist)
+
+    finished = [(best_sol, best_time) for _, _, best_sol, best_time in results if best_sol is not None]
+    if not finished:
+        return
+
+    best_sol, best_time = min(finished, key=lambda x: (-x[0].score, x[0].dist, x[1]))
+    context.best_sol = best_sol
+    context.best_score = best_sol.score
+    context.best_dist = best_sol.dist
+    context.best_time = best_time
@@ -1,29 +1,55 @@
 from .move.move import Move
 
+import numpy as np
+
 class TabuList:
-    def __init__(self, tabu_tenure):
+    def __init__(self, tabu_tenure: int, n: int):
         self.tabu_tenure = tabu_tenure
-        self.tabu_dict = {}
+        self.n = n
+        self.expiry = [-1] * n #last iteration in which each vertex is tabu
+        self.curr_itr = 0
+
+        # copy of expiry and preallocated mask for the batch evaluation (see tabu_mask)
+        self.expiry_array = np.full(n, -1, dtype=np.int64)
+        self.mask = np.zeros(n, dtype=bool)
+        self.mask_itr: int | None = None #iteration of the mask, None: outdated
     
-    def add(self, move: Move, curr_itr):
-        items = move.tabu_add_key()
-        for item in items:
-            self.tabu_dict[item] = curr_itr + self.tabu_tenure
+    def add(self, move: Move, curr_itr: int):
+        expiry = curr_itr + self.tabu_tenure
+        for v in move.tabu_add_key():
+            self.expiry[v] = expiry
+            self.expiry_array[v] = expiry
+        self.mask_itr = None
     
-    def is_tabu(self, move: Move):
-        items = move.tabu_check_key()
-        for item in items:
-            if item in self.tabu_dict:
+    def is_tabu(self, move: Move) -> bool:
+        for v in move.tabu_check_key():
+            if self.expiry[v] >= self.curr_itr:
                 return True
         return False
+
+    def is_vertex_tabu(self, v: int) -> bool:
+        return self.expiry[v] >= self.curr_itr
+
+    def tabu_mask(self) -> np.ndarray:
+        """
+        Boolean mask of the vertices that are currently tabu, computed once per iteration.
+        The returned array is reused between calls, it must not be modified
+        """
+        if self.mask_itr != self.curr_itr:
+            np.greater_equal(self.expiry_array, self.curr_itr, out=self.mask)
+            self.mask_itr = self.curr_itr
+        return self.mask
     
-    def update(self, curr_itr):
-        expired = [item for item, expiry in self.tabu_dict.items() if curr_itr > expiry]
-        for item in expired:
-            del self.tabu_dict[item]
+    def update(self, curr_itr: int):
+        """
+        Move to iteration curr_itr, the expired entries are implicitly released
+        """
+        self.curr_itr = curr_itr
 
     def clear(self):
-        self.tabu_dict = {}
+        self.expiry = [-1] * self.n
+        self.expiry_array.fill(-1)
+        self.mask_itr = None
     
     def __str__(self):
-        return f"TabuList items: {self.tabu_dict}"
+        return f"TabuList items: {[v for v in range(self.n) if self.is_vertex_tabu(v)]}"
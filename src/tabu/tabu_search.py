@@ -8,15 +8,26 @@ from .move.insertion_move import InsertionMove
 from .move.relocate_move import RelocateMove
 from .move.two_opt_move import TwoOptMove
 from .move.replace_move import ReplaceMove
+from .move.three_opt_move import ThreeOptMove
 from .tabu_list import TabuList
+from .dont_look_bits import DontLookBits
 
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import heapq
+import math
 import random
 import time
 
+DIST_EPS = 1e-9
+
+MoveRecord = tuple[type[Move], tuple]
+
 class TabuSearch:
-    def __init__(self, op: OP, context: ExecutionContext, exporter: ResultExporter, ls_first_improve: bool, enable_diversification: bool, enable_intensification: bool, max_time_sec: int, target: int, export_fig_lvl: int, rng: int=0):
+    def __init__(self, op: OP, context: ExecutionContext, exporter: ResultExporter, ls_first_improve: bool, enable_diversification: bool, enable_intensification: bool, max_time_sec: int, target: int, export_fig_lvl: int, rng: int=0, batch_eval: bool=False, neighbors: int=0, dont_look_bits: bool=False, insertion_cache: bool=False, migration=None, eval_threads: int=1, lns=None):
         self.op = op
-        self.evaluator = Evaluator(op)
+        self.evaluator = Evaluator(op, neighbors, insertion_cache)
         self.max_time_sec = max_time_sec
         self.target = target
         self.enable_diversification = enable_diversification
@@ -27,73 +38,174 @@ class TabuSearch:
         self.context = context
 
         self.ls_first_improve = ls_first_improve
+        self.batch_eval = batch_eval
 
         self.exporter = exporter
 
         tabu_tenure = max(3, int(op.n * 0.3))
-        self.tabu_list = TabuList(tabu_tenure)
+        self.tabu_list = TabuList(tabu_tenure, op.n)
+
+        self.dont_look = DontLookBits(op.n, ["relocate", "2-opt"]) if dont_look_bits else None
 
         self.export_fig_lvl = export_fig_lvl
         self.export_fig_count = 0
 
+        # exchange of the best solutions with the other islands of a parallel run (see parallel.Island)
+        self.migration = migration
+
+        # destroy and repair of the best solution with ilp subproblems when the search stalls (see lns.LNS)
+        self.lns = lns
+        self.last_lns_itr = 0
+
+        # persistent pool splitting the intensification neighborhoods (3-opt and intensified
+        # replace) by ranges of route indices, evaluated with numpy in each thread
+        self.eval_threads = eval_threads
+        self.eval_pool = ThreadPoolExecutor(max_workers=eval_threads) if eval_threads > 1 else None
+
         random.seed(rng)
 
     class LocalSearchState:
-        def __init__(self, evaluator: Evaluator, sol: Solution, best_sol: Solution):
+        def __init__(self, sol: Solution, best_sol: Solution):
             # best moves & deltas
+            # the moves are kept as (move class, constructor arguments) records
+            # and only instantiated when applied
             self.best_delta_dist = float("+inf")
-            self.best_dist_move: Move | None = None
+            self.best_dist_move: MoveRecord | None = None
             self.best_delta_score = float("-inf")
-            self.best_score_move: Move | None = None
+            self.best_score_move: MoveRecord | None = None
             self.best_delta_ratio = float("-inf")
-            self.best_ratio_move: Move | None = None
+            self.best_ratio_move: MoveRecord | None = None
 
             # current & best solution metrics
-            self.score_cur_sol = evaluator.total_score(sol)
-            self.dist_cur_sol = evaluator.total_dist(sol)
-            self.score_best_sol = evaluator.total_score(best_sol)
-            self.dist_best_sol = evaluator.total_dist(best_sol)
+            self.score_cur_sol = sol.score
+            self.dist_cur_sol = sol.dist
+            self.score_best_sol = best_sol.score
+            self.dist_best_sol = best_sol.dist
 
-    def solve(self):
-        self.start = time.time()
+    def solve(self, start: float | None=None):
+        self.start = time.time() if start is None else start
 
         self.sol = self.constructive_heuristic()
         self.best_sol = Solution.copy(self.sol)
+        self._reset_dont_look_bits()
 
         itr = 0
         last_solution_change_itr = 0
         
-        while self._time_elapsed() < self.max_time_sec and not self.best_sol.are_all_vertices_in_path() and self.evaluator.total_score(self.best_sol) < self.target:
+        while not self._should_stop():
             self.local_search(itr, last_solution_change_itr)
 
             if self._update_best_sol():
                 last_solution_change_itr = itr     
                 self._save_improve_data("[local_search] best sol improved", "improve_global", self.best_sol)           
 
-            if self._trigger_diversification_criteria(itr, last_solution_change_itr):
+            if self.migration is not None:
+                self.migration.send(itr, self.best_sol)
+
+            if self._trigger_migration_criteria(itr, last_solution_change_itr) and self._restart_from_migrant():
+                last_solution_change_itr = itr
+                if self._update_best_sol():
+                    self._save_improve_data("[migration] best sol improved", "improve_global", self.best_sol)
+
+            elif self._trigger_lns_criteria(itr, last_solution_change_itr) and self._repair_with_lns(itr):
+                last_solution_change_itr = itr
+                if self._update_best_sol():
+                    self._save_improve_data("[lns] best sol improved", "improve_global", self.best_sol)
+
+            elif self._trigger_diversification_criteria(itr, last_solution_change_itr):
                 last_solution_change_itr = itr
                 self._diversify()
                 self._export_figure(self.sol, "diversify")
 
             itr += 1
 
+        # stop the other workers of a parallel run
+        self.context.request_stop()
+
+        if self.eval_pool is not None:
+            self.eval_pool.shutdown()
+
+    def _should_stop(self) -> bool:
+        if self._time_elapsed() >= self.max_time_sec or self.best_sol.are_all_vertices_in_path():
+            return True
+
+        best_score = self.best_sol.score
+        shared_score = self.context.shared_best_score()
+        if shared_score is not None:
+            best_score = max(best_score, shared_score)
+
+        # upper bound of the score published by the ilp solver running concurrently (portfolio), the scores are integers
+        bound = self.context.UB
+        if bound is not None and math.isfinite(bound) and best_score >= math.floor(bound + 1e-6):
+            return True
+
+        return best_score >= self.target or self.context.stop_requested()
+
     def constructive_heuristic(self) -> Solution:
-        self.sol = Solution.create_trivial_path(self.op.n)
+        """
+        Greedy insertion of the best delta ratio move until no insertion is feasible.
+
+        Same result as scanning every insertion candidate in each round (ties go to the
+        smallest vertex, then to the earliest position), but the best feasible insertion
+        of each vertex is kept in a lazy max-heap keyed by (ratio, vertex). The keys are
+        upper bounds of the current ratios, since an insertion only removes one arc and
+        increases the distance, so a popped entry is only evaluated again when its arc was
+        removed or it became infeasible. The two new arcs are checked for every vertex.
+        """
+        self.sol = Solution.create_trivial_path(self.op)
+        sol = self.sol
+        evaluator = self.evaluator
+
+        best: dict[int, tuple[float, float, int, int]] = {} #cand -> (ratio, delta dist, prev, next)
+        heap: list[tuple[float, int, tuple]] = []
+
+        def push(cand: int, entry: tuple[float, float, int, int]):
+            best[cand] = entry
+            heapq.heappush(heap, (-entry[0], cand, entry))
+
+        def insertion(cand: int, prev: int, next: int) -> tuple[float, float, int, int] | None:
+            delta_dist = self.op.A_rows[prev][cand] + self.op.A_rows[cand][next] - self.op.A_rows[prev][next]
+            if sol.dist + delta_dist > self.op.t_max:
+                return None
+            delta_ratio = evaluator._calculate_delta_improve(evaluator._evaluate_insertion_delta_score(cand), delta_dist)
+            return (delta_ratio, delta_dist, prev, next)
+
+        def evaluate(cand: int):
+            best.pop(cand, None)
+            entry = None
+            for prev in sol.get_vertices()[:-1]: #disconsider the last vertex
+                new_entry = insertion(cand, prev, sol.next[prev])
+                if new_entry is not None and (entry is None or new_entry[0] > entry[0]):
+                    entry = new_entry
+            if entry is not None:
+                push(cand, entry)
+
+        for cand in sol.get_remaining_vertices():
+            evaluate(cand)
+
+        while heap:
+            _, cand, entry = heapq.heappop(heap)
+            if best.get(cand) is not entry: #outdated entry
+                continue
 
-        while True:
-            best_delta_ratio = float('-inf')
-            best_candidate: Move = None
+            delta_ratio, delta_dist, prev, next = entry
+            if sol.next[prev] != next or sol.dist + delta_dist > self.op.t_max:
+                evaluate(cand)
+                continue
 
-            for candidate in self.evaluator.insertion_candidates(self.sol):
-                if candidate.delta_ratio() > best_delta_ratio:
-                    best_delta_ratio = candidate.delta_ratio()
-                    best_candidate = candidate
+            del best[cand]
+            self._apply_move(InsertionMove(cand, prev, evaluator._evaluate_insertion_delta_score(cand), delta_dist, delta_ratio))
+            self._save_improve_data("[constructive_heuristic] best sol improved", "constructive_heuristic", self.sol)
 
-            if best_candidate is not None:
-                best_candidate.apply_move(self.sol)
-                self._save_improve_data("[constructive_heuristic] best sol improved", "constructive_heuristic", self.sol)
-            else:
-                break
+            for other in sol.unvisited:
+                cur = best.get(other)
+                for arc in ((prev, cand), (cand, next)):
+                    new_entry = insertion(other, *arc)
+                    if new_entry is None:
+                        continue
+                    if cur is None or new_entry[0] > cur[0] or (new_entry[0] == cur[0] and sol.pos[arc[0]] < sol.pos[cur[2]]):
+                        cur = new_entry
+                        push(other, cur)
 
         self.context.log(f"[constructive_heuristic] finished construction phase, {self.sol}", save=True)
         self._export_figure(self.sol, "constructive_heuristic_sol", lvl=0)
@@ -108,7 +220,7 @@ class TabuSearch:
     def local_search(self, itr: int, last_solution_change_itr: int):
         self._update_tabus(itr)
 
-        state = self.LocalSearchState(self.evaluator, self.sol, self.best_sol)
+        state = self.LocalSearchState(self.sol, self.best_sol)
         if self._search_insertion(state):
             self._export_figure(self.sol, "insertion")
             return
@@ -117,17 +229,21 @@ class TabuSearch:
             self._export_figure(self.sol, "replace")
             return
     
-        if state.best_delta_score > 0.0 and not self._is_move_forbidden(state.best_score_move, state, use_metric_score=True):
-            self.context.log(f"[local_search] applying best score move: {state.best_score_move}")
-            state.best_score_move.apply_move(self.sol)
-            self._export_figure(self.sol, "best_score_move")
-            return
+        if state.best_delta_score > 0.0:
+            move = self._materialize(state.best_score_move)
+            if not self._is_move_forbidden(move, state, use_metric_score=True):
+                self.context.log(f"[local_search] applying best score move: {move}")
+                self._apply_move(move)
+                self._export_figure(self.sol, "best_score_move")
+                return
 
-        if state.best_delta_ratio > 0.0 and not self._is_move_forbidden(state.best_ratio_move, state, use_metric_score=True):
-            self.context.log(f"[local_search] applying best ratio move: {state.best_ratio_move}")
-            state.best_ratio_move.apply_move(self.sol)
-            self._export_figure(self.sol, "best_ratio_move")
-            return
+        if state.best_delta_ratio > 0.0:
+            move = self._materialize(state.best_ratio_move)
+            if not self._is_move_forbidden(move, state, use_metric_score=True):
+                self.context.log(f"[local_search] applying best ratio move: {move}")
+                self._apply_move(move)
+                self._export_figure(self.sol, "best_ratio_move")
+                return
         
         if self._search_relocate(state):
             self._export_figure(self.sol, "relocate")
@@ -137,11 +253,13 @@ class TabuSearch:
             self._export_figure(self.sol, "2-opt")
             return
         
-        if state.best_delta_dist < 0.0 and not self._is_move_forbidden(state.best_dist_move, state, use_metric_score=False):
-            self.context.log(f"[local_search] applying best_dist_move move: {state.best_dist_move}")
-            state.best_dist_move.apply_move(self.sol)
-            self._export_figure(self.sol, "best_dist_move")
-            return
+        if state.best_delta_dist < 0.0:
+            move = self._materialize(state.best_dist_move)
+            if not self._is_move_forbidden(move, state, use_metric_score=False):
+                self.context.log(f"[local_search] applying best_dist_move move: {move}")
+                self._apply_move(move)
+                self._export_figure(self.sol, "best_dist_move")
+                return
         
         if self._trigger_intensification_criteria(itr, last_solution_change_itr) and self._intensification_search():
             self.context.log(f"[local_search] intensification successfully improved sol")
@@ -156,9 +274,34 @@ class TabuSearch:
             itr
         )
 
-    def _apply_non_improving_move(self, move1: Move, move2: Move, move3: Move, itr: int):
+    def _materialize(self, record: MoveRecord | None) -> Move | None:
+        if record is None:
+            return None
+        move_cls, args = record
+        return move_cls(*args)
+
+    def _apply_move(self, move: Move):
+        """
+        Apply the move to the current solution and wake up the don't-look bits around it.
+        Moves that change the score (insertion, replace) reset all the bits.
+        """
+        if self.dont_look is None or move.delta_score() is not None:
+            move.apply_move(self.sol)
+            self._reset_dont_look_bits()
+            return
+
+        touched = move.touched_vertices(self.sol)
+        move.apply_move(self.sol)
+        neighbors = [u for v in touched for u in (self.sol.prev[v], self.sol.next[v]) if u is not None]
+        self.dont_look.wake(touched + neighbors)
+
+    def _reset_dont_look_bits(self):
+        if self.dont_look is not None:
+            self.dont_look.reset()
+
+    def _apply_non_improving_move(self, move1: MoveRecord | None, move2: MoveRecord | None, move3: MoveRecord | None, itr: int):
         valid_moves = [
-            m for m in [move1, move2, move3]
+            m for m in map(self._materialize, [move1, move2, move3])
             if m is not None and not self.tabu_list.is_tabu(m)
         ]
         if len(valid_moves) == 0:
@@ -168,88 +311,234 @@ class TabuSearch:
         move = random.choice(valid_moves)
 
         self.context.log(f"[local_search] applying non-improving move {move}")
-        move.apply_move(self.sol)
+        self._apply_move(move)
         self._export_figure(self.sol, f"non_improving_{type(move).__name__}")
 
         self.tabu_list.add(move, itr)
 
     def _search_insertion(self, state: LocalSearchState) -> bool:
-        for move in self.evaluator.insertion_candidates(self.sol):
-            delta_ratio = move.delta_ratio()
+        # the cached scan is cheaper than the batch evaluation of the whole neighborhood
+        if self.batch_eval and self.evaluator.insertion_cache is None:
+            return self._search_insertion_batch(state)
 
-            if self._is_move_forbidden(move, state, use_metric_score=True):
+        for candidate in self.evaluator.insertion_candidates(self.sol):
+            cand, _, delta_score, _, delta_ratio = candidate
+
+            if self._is_forbidden(self.tabu_list.is_vertex_tabu(cand), delta_score, None, state, use_metric_score=True):
                 continue
 
             if self.ls_first_improve and delta_ratio > 0:
+                move = InsertionMove(*candidate)
                 self.context.log(f"[local_search] applying insertion move (first-improve): {move}")
-                move.apply_move(self.sol)
+                self._apply_move(move)
                 return True
             
             if delta_ratio > state.best_delta_ratio:
                 state.best_delta_ratio = delta_ratio
-                state.best_ratio_move = move
+                state.best_ratio_move = (InsertionMove, candidate)
         
         return False
     
+    def _search_insertion_batch(self, state: LocalSearchState) -> bool:
+        """
+        Same as _search_insertion, but evaluating the whole neighborhood with numpy.
+        Only the selected move is instantiated.
+        """
+        cands, prevs, delta_score, delta_dist, delta_ratio, feasible = self.evaluator.insertion_batch(self.sol)
+        if not feasible.any():
+            return False
+
+        #aspiration criteria
+        tabu = self.tabu_list.tabu_mask()[cands]
+        allowed = ~tabu | (state.score_cur_sol + delta_score > state.score_best_sol)
+        valid = feasible & allowed[:, None]
+
+        def candidate_at(idx: int) -> tuple:
+            i, j = np.unravel_index(idx, valid.shape)
+            return (int(cands[i]), int(prevs[j]), int(delta_score[i]), float(delta_dist[i, j]), float(delta_ratio[i, j]))
+
+        if self.ls_first_improve:
+            improving = valid & (delta_ratio > 0)
+            idx = int(np.argmax(improving))
+            if improving.flat[idx]:
+                move = InsertionMove(*candidate_at(idx))
+                self.context.log(f"[local_search] applying insertion move (first-improve): {move}")
+                self._apply_move(move)
+                return True
+
+        ratio = np.where(valid, delta_ratio, -np.inf)
+        idx = int(np.argmax(ratio))
+        if valid.flat[idx] and ratio.flat[idx] > state.best_delta_ratio:
+            state.best_delta_ratio = float(ratio.flat[idx])
+            state.best_ratio_move = (InsertionMove, candidate_at(idx))
+
+        return False
+
     def _search_replace(self, state: LocalSearchState) -> bool:
-        for move in self.evaluator.replace_candidates(self.sol):
-            delta_score = move.delta_score()
-            delta_dist = move.delta_distance()
-            delta_ratio = move.delta_ratio()
+        if self.batch_eval:
+            return self._search_replace_batch(state)
+
+        for candidate in self.evaluator.replace_candidates(self.sol):
+            in_cand, _, out_cand, delta_score, delta_dist, delta_ratio = candidate
+            is_tabu = self.tabu_list.is_vertex_tabu(out_cand) or self.tabu_list.is_vertex_tabu(in_cand)
 
             #case 1: the replace move does not increase the score
             # occurs when the two swapped vertices have the same score
             # then, only the delta distance is verified
             if delta_score == 0.0:
-                if self._is_move_forbidden(move, state, use_metric_score=False):
+                if self._is_forbidden(is_tabu, delta_score, delta_dist, state, use_metric_score=False):
                     continue
 
                 if self.ls_first_improve and delta_dist < 0.0:
+                    move = ReplaceMove(*candidate)
                     self.context.log(f"[local_search] applying replace move (first-improve): {move}")
-                    move.apply_move(self.sol)
+                    self._apply_move(move)
                     return True
 
                 if delta_dist < state.best_delta_dist:
                     state.best_delta_dist = delta_dist
-                    state.best_dist_move = move
+                    state.best_dist_move = (ReplaceMove, candidate)
 
             #case 2: when both the score and the distance are improved 
             elif delta_dist < 0.0:
-                if self._is_move_forbidden(move, state, use_metric_score=True):
+                if self._is_forbidden(is_tabu, delta_score, delta_dist, state, use_metric_score=True):
                     continue
 
                 if self.ls_first_improve:
+                    move = ReplaceMove(*candidate)
                     self.context.log(f"[local_search] applying replace move (first-improve): {move}")
-                    move.apply_move(self.sol)
+                    self._apply_move(move)
                     return True
                 
                 if delta_score > state.best_delta_score:
                     state.best_delta_score = delta_score
-                    state.best_score_move = move
+                    state.best_score_move = (ReplaceMove, candidate)
 
             #Case 3: when the score is improved, but the distance does not improve
             else: # delta_score > 0.0, delta_dist >= 0.0
-                if self._is_move_forbidden(move, state, use_metric_score=True):
+                if self._is_forbidden(is_tabu, delta_score, delta_dist, state, use_metric_score=True):
                     continue
                                     
                 if self.ls_first_improve and delta_ratio > 0.0:
+                    move = ReplaceMove(*candidate)
                     self.context.log(f"[local_search] applying replace move (first-improve): {move}")
-                    move.apply_move(self.sol)
+                    self._apply_move(move)
                     return True
                 
                 if delta_ratio > state.best_delta_ratio:
                     state.best_delta_ratio = delta_ratio
-                    state.best_ratio_move = move
+                    state.best_ratio_move = (ReplaceMove, candidate)
         
         return False
     
+    def _search_replace_batch(self, state: LocalSearchState) -> bool:
+        """
+        Same as _search_replace, but evaluating the whole neighborhood with numpy.
+        Only the selected moves are instantiated.
+        """
+        out_cands, insert_pos, in_cands, delta_score, delta_dist, delta_ratio, feasible = self.evaluator.replace_batch(self.sol)
+        if not feasible.any():
+            return False
+
+        #aspiration criteria, by distance for the moves that keep the score and by score otherwise
+        tabu_mask = self.tabu_list.tabu_mask()
+        tabu = tabu_mask[out_cands][:, None] | tabu_mask[in_cands][None, :]
+        forbidden_dist = tabu & (state.dist_cur_sol + delta_dist >= state.dist_best_sol - DIST_EPS)
+        forbidden_score = tabu & (state.score_cur_sol + delta_score <= state.score_best_sol)
+
+        same_score = feasible & (delta_score == 0) & ~forbidden_dist #case 1
+        improves_both = feasible & (delta_score > 0) & (delta_dist < 0.0) & ~forbidden_score #case 2
+        improves_score = feasible & (delta_score > 0) & (delta_dist >= 0.0) & ~forbidden_score #case 3
+
+        def candidate_at(idx: int) -> tuple:
+            i, j = np.unravel_index(idx, feasible.shape)
+            return (int(in_cands[j]), int(insert_pos[i]), int(out_cands[i]), int(delta_score[i, j]), float(delta_dist[i, j]), float(delta_ratio[i, j]))
+
+        if self.ls_first_improve:
+            improving = (same_score & (delta_dist < 0.0)) | improves_both | (improves_score & (delta_ratio > 0.0))
+            idx = int(np.argmax(improving))
+            if improving.flat[idx]:
+                move = ReplaceMove(*candidate_at(idx))
+                self.context.log(f"[local_search] applying replace move (first-improve): {move}")
+                self._apply_move(move)
+                return True
+
+        dist = np.where(same_score, delta_dist, np.inf)
+        idx = int(np.argmin(dist))
+        if same_score.flat[idx] and dist.flat[idx] < state.best_delta_dist:
+            state.best_delta_dist = float(dist.flat[idx])
+            state.best_dist_move = (ReplaceMove, candidate_at(idx))
+
+        score = np.where(improves_both, delta_score, np.iinfo(np.int64).min)
+        idx = int(np.argmax(score))
+        if improves_both.flat[idx] and score.flat[idx] > state.best_delta_score:
+            state.best_delta_score = int(score.flat[idx])
+            state.best_score_move = (ReplaceMove, candidate_at(idx))
+
+        ratio = np.where(improves_score, delta_ratio, -np.inf)
+        idx = int(np.argmax(ratio))
+        if improves_score.flat[idx] and ratio.flat[idx] > state.best_delta_ratio:
+            state.best_delta_ratio = float(ratio.flat[idx])
+            state.best_ratio_move = (ReplaceMove, candidate_at(idx))
+
+        return False
+
     def _trigger_diversification_criteria(self, cur_itr: int, last_solution_change_itr: int):
         if not self.enable_diversification:
             return False
         
+        return self._is_stalled(cur_itr, last_solution_change_itr)
+
+    def _trigger_migration_criteria(self, cur_itr: int, last_solution_change_itr: int):
+        if self.migration is None:
+            return False
+
+        return self._is_stalled(cur_itr, last_solution_change_itr)
+
+    def _trigger_lns_criteria(self, cur_itr: int, last_solution_change_itr: int):
+        if self.lns is None:
+            return False
+
+        # a failed repair is only tried again after another stall period
+        return self._is_stalled(cur_itr, max(last_solution_change_itr, self.last_lns_itr))
+
+    def _is_stalled(self, cur_itr: int, last_solution_change_itr: int):
         threshold = 50
         return cur_itr - last_solution_change_itr > threshold
 
+    def _repair_with_lns(self, itr: int) -> bool:
+        """
+        Restart the search from the best solution repaired by the lns, if it improved
+        """
+        self.last_lns_itr = itr
+        repaired = self.lns.improve(self.best_sol, self.context.out_relative_path, self.max_time_sec - self._time_elapsed())
+        if repaired is None:
+            return False
+
+        self.context.log(f"[lns] restarting from repaired solution: score={repaired.score}, dist={repaired.dist}, {repaired}", save=True)
+        self.sol = repaired
+
+        self.tabu_list.clear()
+        self._reset_dont_look_bits()
+        self._export_figure(self.sol, "lns")
+        return True
+
+    def _restart_from_migrant(self) -> bool:
+        """
+        Restart the search from the best solution received from the other islands, if any
+        """
+        migrant = self.migration.receive(self.op)
+        if migrant is None:
+            return False
+
+        self.context.log(f"[migration] restarting from migrant: score={migrant.score}, dist={migrant.dist}, {migrant}", save=True)
+        self.sol = migrant
+
+        self.tabu_list.clear()
+        self._reset_dont_look_bits()
+        self._export_figure(self.sol, "migration")
+        return True
+
     def _diversify(self):
         self.context.log(f"[local_search] diversifying the best sol: {self.best_sol}")
 
@@ -259,6 +548,7 @@ class TabuSearch:
         self.context.log(f"[local_search] sol after diversification: {self.sol}")
 
         self.tabu_list.clear()
+        self._reset_dont_look_bits()
 
     def _trigger_intensification_criteria(self, cur_itr: int, last_solution_change_itr: int):
         if not self.enable_intensification or cur_itr < 5:
@@ -273,101 +563,183 @@ class TabuSearch:
         return False
     
     def _search_intensified_replace(self, state: LocalSearchState) -> bool:
-        for move in self.evaluator.intensified_replace_candidates(self.sol):
-            delta_score = move.delta_score()
-            delta_dist = move.delta_distance()
-            delta_ratio = move.delta_ratio()
+        if self.eval_pool is not None and self.evaluator.insertion_cache is None:
+            return self._search_intensified_replace_parallel(state)
+
+        for candidate in self.evaluator.intensified_replace_candidates(self.sol):
+            _, _, _, delta_score, delta_dist, delta_ratio = candidate
 
             #case 1: the replace move does not increase the score
             # occurs when the two swapped vertices have the same score
             # then, only the delta distance is verified
             if delta_score == 0.0:
                 if self.ls_first_improve and delta_dist < 0.0:
+                    move = ReplaceMove(*candidate)
                     self.context.log(f"[local_search] intensification: applying replace move (first-improve): {move}")
-                    move.apply_move(self.sol)
+                    self._apply_move(move)
                     return True
 
                 if delta_dist < state.best_delta_dist:
                     state.best_delta_dist = delta_dist
-                    state.best_dist_move = move
+                    state.best_dist_move = (ReplaceMove, candidate)
 
             #case 2: when both the score and the distance are improved 
             elif delta_dist < 0.0:
                 if self.ls_first_improve:
+                    move = ReplaceMove(*candidate)
                     self.context.log(f"[local_search] intensification: applying replace move (first-improve): {move}")
-                    move.apply_move(self.sol)
+                    self._apply_move(move)
                     return True
                 
                 if delta_score > state.best_delta_score:
                     state.best_delta_score = delta_score
-                    state.best_score_move = move
+                    state.best_score_move = (ReplaceMove, candidate)
 
             #Case 3: when the score is improved, but the distance does not improve
             else: # delta_score > 0.0, delta_dist >= 0.0  
                 if self.ls_first_improve and delta_ratio > 0.0:
+                    move = ReplaceMove(*candidate)
                     self.context.log(f"[local_search] intensification: applying replace move (first-improve): {move}")
-                    move.apply_move(self.sol)
+                    self._apply_move(move)
                     return True
                 
                 if delta_ratio > state.best_delta_ratio:
                     state.best_delta_ratio = delta_ratio
-                    state.best_ratio_move = move
+                    state.best_ratio_move = (ReplaceMove, candidate)
         
         return False
     
     def _search_threeOpt(self, state: LocalSearchState) -> bool:
-        for move in self.evaluator.threeOpt_candidates(self.sol):
-            delta_dist = move.delta_distance()
+        if self.eval_pool is not None and self.evaluator.neighbors is None:
+            return self._search_threeOpt_parallel(state)
+
+        for candidate in self.evaluator.threeOpt_candidates(self.sol):
+            delta_dist = candidate[4]
 
             if self.ls_first_improve and delta_dist < 0.0:
+                move = ThreeOptMove(*candidate)
                 self.context.log(f"[local_search] intensification: applying 3-opt move (first-improve): {move}")
-                move.apply_move(self.sol)
+                self._apply_move(move)
                 return True
 
             if delta_dist < state.best_delta_dist:
                 state.best_delta_dist = delta_dist
-                state.best_dist_move = move
+                state.best_dist_move = (ThreeOptMove, candidate)
 
         return False
     
+    def _map_route_ranges(self, fn, rows: range) -> list[tuple]:
+        """
+        Evaluate fn(sol, chunk, route, nexts, first_improve) for contiguous chunks of the route
+        indices in the eval pool. The results are returned in the order of the chunks.
+        """
+        route, nexts = self.evaluator.route_arrays(self.sol)
+
+        # more chunks than threads, the cost of the rows is not uniform
+        n_chunks = max(1, min(len(rows), self.eval_threads * 4))
+        bounds = np.linspace(0, len(rows), n_chunks + 1).astype(int)
+        chunks = [rows[bounds[c]:bounds[c + 1]] for c in range(n_chunks)]
+
+        return list(self.eval_pool.map(lambda chunk: fn(self.sol, chunk, route, nexts, self.ls_first_improve), chunks))
+
+    def _search_threeOpt_parallel(self, state: LocalSearchState) -> bool:
+        """
+        Same as _search_threeOpt, reducing the results of the chunks in the order of the sequential scan
+        """
+        for first, best in self._map_route_ranges(self.evaluator.threeOpt_rows, range(len(self.sol.get_vertices()))):
+            if first is not None:
+                move = ThreeOptMove(*first)
+                self.context.log(f"[local_search] intensification: applying 3-opt move (first-improve): {move}")
+                self._apply_move(move)
+                return True
+
+            if best is not None and best[4] < state.best_delta_dist:
+                state.best_delta_dist = best[4]
+                state.best_dist_move = (ThreeOptMove, best)
+
+        return False
+
+    def _search_intensified_replace_parallel(self, state: LocalSearchState) -> bool:
+        """
+        Same as _search_intensified_replace, reducing the results of the chunks in the order of the sequential scan
+        """
+        for first, best_dist, best_score, best_ratio in self._map_route_ranges(self.evaluator.intensified_replace_rows, range(1, len(self.sol.get_vertices()) - 1)):
+            if first is not None:
+                move = ReplaceMove(*first)
+                self.context.log(f"[local_search] intensification: applying replace move (first-improve): {move}")
+                self._apply_move(move)
+                return True
+
+            if best_dist is not None and best_dist[4] < state.best_delta_dist:
+                state.best_delta_dist = best_dist[4]
+                state.best_dist_move = (ReplaceMove, best_dist)
+
+            if best_score is not None and best_score[3] > state.best_delta_score:
+                state.best_delta_score = best_score[3]
+                state.best_score_move = (ReplaceMove, best_score)
+
+            if best_ratio is not None and best_ratio[5] > state.best_delta_ratio:
+                state.best_delta_ratio = best_ratio[5]
+                state.best_ratio_move = (ReplaceMove, best_ratio)
+
+        return False
+
     def _search_relocate(self, state: LocalSearchState) -> bool:
-        for move in self.evaluator.relocate_candidates(self.sol):
-            delta_dist = move.delta_distance()
+        skip = self.dont_look.skip_mask("relocate") if self.dont_look is not None else None
+        improving = set()
 
-            if self._is_move_forbidden(move, state, use_metric_score=False):
+        for candidate in self.evaluator.relocate_candidates(self.sol, skip):
+            cand, _, delta_dist = candidate
+            if delta_dist < 0.0:
+                improving.add(cand)
+
+            if self._is_forbidden(self.tabu_list.is_vertex_tabu(cand), None, delta_dist, state, use_metric_score=False):
                 continue
 
             if self.ls_first_improve and delta_dist < 0.0:
+                move = RelocateMove(*candidate)
                 self.context.log(f"[local_search] applying relocate move (first-improve): {move}")
-                move.apply_move(self.sol)
+                self._apply_move(move)
                 return True
 
             if delta_dist < state.best_delta_dist:
                 state.best_delta_dist = delta_dist
-                state.best_dist_move = move
+                state.best_dist_move = (RelocateMove, candidate)
         
+        if self.dont_look is not None:
+            self.dont_look.sleep("relocate", self.sol.get_vertices(), improving)
+
         return False
     
     def _search_twoOpt(self, state: LocalSearchState) -> bool:
-        for move in self.evaluator.twoOpt_candidates(self.sol):
-            delta_dist = move.delta_distance()
+        skip = self.dont_look.skip_mask("2-opt") if self.dont_look is not None else None
+        improving = set()
 
-            if self._is_move_forbidden(move, state, use_metric_score=False):
+        for candidate in self.evaluator.twoOpt_candidates(self.sol, skip):
+            v1, v2, delta_dist = candidate
+            if delta_dist < 0.0:
+                improving.add(v1)
+
+            if self._is_forbidden(self.tabu_list.is_vertex_tabu(v1) or self.tabu_list.is_vertex_tabu(v2), None, delta_dist, state, use_metric_score=False):
                 continue
 
             if self.ls_first_improve and delta_dist < 0.0:
+                move = TwoOptMove(*candidate)
                 self.context.log(f"[local_search] applying 2-opt move (first-improve): {move}")
-                move.apply_move(self.sol)
+                self._apply_move(move)
                 return True
 
             if delta_dist < state.best_delta_dist:
                 state.best_delta_dist = delta_dist
-                state.best_dist_move = move
+                state.best_dist_move = (TwoOptMove, candidate)
+
+        if self.dont_look is not None:
+            self.dont_look.sleep("2-opt", self.sol.get_vertices(), improving)
 
         return False
     
     def _intensification_search(self) -> bool:
-        state = self.LocalSearchState(self.evaluator, self.sol, self.best_sol)
+        state = self.LocalSearchState(self.sol, self.best_sol)
 
         self.context.log(f"[local_search] intensification...")
 
@@ -376,14 +748,16 @@ class TabuSearch:
             return True
         
         if state.best_delta_score > 0.0:
-            self.context.log(f"[local_search] intensification: applying best score move: {state.best_score_move}")
-            state.best_score_move.apply_move(self.sol)
+            move = self._materialize(state.best_score_move)
+            self.context.log(f"[local_search] intensification: applying best score move: {move}")
+            self._apply_move(move)
             self._export_figure(self.sol, "intensification_best_score_move")
             return True
 
         if state.best_delta_ratio > 0.0:
-            self.context.log(f"[local_search] intensification: applying best ratio move: {state.best_ratio_move}")
-            state.best_ratio_move.apply_move(self.sol)
+            move = self._materialize(state.best_ratio_move)
+            self.context.log(f"[local_search] intensification: applying best ratio move: {move}")
+            self._apply_move(move)
             self._export_figure(self.sol, "intensification_best_ratio_move")
             return True
         
@@ -392,8 +766,9 @@ class TabuSearch:
             return True
         
         if state.best_delta_dist < 0.0:
-            self.context.log(f"[local_search] intensification: best_dist move: {state.best_dist_move}")
-            state.best_dist_move.apply_move(self.sol)
+            move = self._materialize(state.best_dist_move)
+            self.context.log(f"[local_search] intensification: best_dist move: {move}")
+            self._apply_move(move)
             self._export_figure(self.sol, "intensification_best_dist_move")
             return True
         
@@ -405,37 +780,39 @@ class TabuSearch:
         Returns True if the move is tabu and should be skipped,
         based on the chosen metric ('score', 'dist').
         """
-        if not self.tabu_list.is_tabu(move):
+        is_forbidden = self._is_forbidden(self.tabu_list.is_tabu(move), move.delta_score(), move.delta_distance(), state, use_metric_score)
+        if is_forbidden:
+            metric = "score" if use_metric_score else "dist"
+            self.context.log(f"[local_search] move forbidden due to {metric} metric, {move}")
+        return is_forbidden
+
+    def _is_forbidden(self, is_tabu: bool, delta_score: float | None, delta_dist: float | None, state: LocalSearchState, use_metric_score: bool) -> bool:
+        """
+        Same as _is_move_forbidden for a candidate that was not instantiated as a Move.
+        """
+        if not is_tabu:
             return False
 
         if use_metric_score:
             #aspiration criteria
-            is_forbidden = state.score_cur_sol + move.delta_score() <= state.score_best_sol
-            if is_forbidden:
-                self.context.log(f"[local_search] move forbidden due to score metric, {move}")
-            return is_forbidden
+            return state.score_cur_sol + delta_score <= state.score_best_sol
         
-        #aspiration criteria
-        is_forbidden = state.dist_cur_sol + move.delta_distance() >= state.dist_best_sol
-        if is_forbidden:
-            self.context.log(f"[local_search] move forbidden due to dist metric, {move}")
-
-        return is_forbidden
+        #aspiration criteria (tolerance for the rounding errors of the cached distances)
+        return state.dist_cur_sol + delta_dist >= state.dist_best_sol - DIST_EPS
 
     def _update_tabus(self, itr: int):
         self.tabu_list.update(itr)
         
     def _update_best_sol(self) -> bool:
-        score_sol = self.evaluator.total_score(self.sol)
-        score_best_sol = self.evaluator.total_score(self.best_sol)
+        score_sol = self.sol.score
+        score_best_sol = self.best_sol.score
         
         if score_sol > score_best_sol:
             self.best_sol = Solution.copy(self.sol)
             return True
         elif score_sol == score_best_sol:
-            dist_sol = self.evaluator.total_dist(self.sol)
-            dist_best_sol = self.evaluator.total_dist(self.best_sol)
-            if dist_sol < dist_best_sol:
+            #tolerance for the rounding errors of the cached distances
+            if self.sol.dist < self.best_sol.dist - DIST_EPS:
                 self.best_sol = Solution.copy(self.sol)
                 return True
         return False
@@ -444,8 +821,8 @@ class TabuSearch:
         return time.time() - self.start
     
     def _save_improve_data(self, log_prefix: str, fig_name: str, sol: Solution):
-        score = self.evaluator.total_score(sol)
-        dist = self.evaluator.total_dist(sol)
+        score = sol.score
+        dist = sol.dist
 
         self.context.log(f"{log_prefix}: score={score}, dist={dist}, {sol}", save=True)
         self.context.add_improve(sol, self._time_elapsed())